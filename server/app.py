@@ -1,83 +1,371 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.datastructures import Default
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from models import Problem, HintResponse, ProblemMeta, Complexity, ChatMessage, ChatResponse
+from models import (
+    Problem, HintResponse, ProblemMeta, Complexity, ChatMessage, ChatResponse, ChatSessionCreate, ChatSessionInfo,
+    ProblemRequest, TutoringRequest, TutoringBatchRequest, SolutionRequest, TagBatchRequest,
+    HintsResponse, PlanResponse, EdgeCasesResponse, ComplexityResponse, SolutionResponse, TagBatchResponse
+)
+from cache import ResponseCache, create_cache_store
+from dedup import ProblemIndex
+from singleflight import SingleFlight
+from clients import ClientPool, hash_api_key
+from prompts import PromptBuilder, PromptStats
+from sessions import ChatSession, ChatSessionStore, EditorConflict
+from tagging import score_tags, tag_many, tags_from_scores
+import metrics
+import tracing
+from compression import BodyCompressor, ConditionalCompressionMiddleware, content_etag
+from metrics import MetricsMiddleware, numeric_stats, record_fallback, upstream_call
+from routing import LatencyTracker, hedged, load_routes
+from upstream import CircuitBreaker, UpstreamOverloaded, UpstreamScheduler, is_background
+from prefetch import Prefetcher
+from serialization import FastJSONResponse, dumps
+from tracing import SpanExporter, TracingMiddleware
+from streaming import EventStreamResponse, format_event, negotiate_stream_format, replay_text, stream_chat_completion
+import asyncio
+import json
 import re
 import os
-from typing import List
-from openai import OpenAI
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="TutorAI API", version="1.0.0")
+LLMClient = Union[AsyncOpenAI, OpenAI]
 
-openai_client = None
 openai_client = None
 api_key = os.getenv('OPENAI_API_KEY')
 if api_key:
-    openai_client = OpenAI(api_key=api_key)
+    openai_client = OpenAI(api_key=api_key, max_retries=0)
+
+# Long-lived async clients, one per API key (hashed), sharing a single keep-alive
+# connection pool so bring-your-own-key requests skip client setup and TLS handshakes.
+client_pool = ClientPool(
+    max_clients=int(os.getenv("OPENAI_CLIENT_POOL_SIZE", "256")),
+    idle_timeout=float(os.getenv("OPENAI_CLIENT_IDLE_TIMEOUT", "900")),
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+)
+
+# Speculative generation of the sections a client usually asks for next (see
+# schedule_prefetch). Off unless PREFETCH is set, since it spends tokens.
+prefetcher = None
+if os.getenv("PREFETCH", "0").lower() in ("1", "true", "yes"):
+    prefetcher = Prefetcher(
+        workers=int(os.getenv("PREFETCH_WORKERS", "2")),
+        max_queue=int(os.getenv("PREFETCH_QUEUE_SIZE", "256")),
+        token_budget=int(os.getenv("PREFETCH_TOKEN_BUDGET", "200000")),
+        budget_window=float(os.getenv("PREFETCH_BUDGET_WINDOW", "3600"))
+    )
+
+# Sampled per-request traces: spans around handlers, section generators, cache
+# lookups and upstream calls, written by a background thread to a rotating JSONL
+# file (or a local collector). TRACE_SAMPLE_RATE=0, the default, turns it off.
+tracer = tracing.configure(
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+    exporter=SpanExporter(
+        path=os.getenv("TRACE_FILE", "tutorai-traces.jsonl"),
+        url=os.getenv("TRACE_COLLECTOR_URL") or None,
+        max_bytes=int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024))),
+        backups=int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+    )
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if prefetcher is not None:
+        prefetcher.start()
+    yield
+    if prefetcher is not None:
+        await prefetcher.stop()
+    await client_pool.aclose()
+    tracer.exporter.close()
+
+# Plain dict responses are rendered with orjson when available. Wrapped in
+# Default() so routes with a response model keep FastAPI's own fast path, which
+# serializes the model straight to bytes.
+app = FastAPI(title="TutorAI API", version="1.0.0", lifespan=lifespan, default_response_class=Default(FastJSONResponse))
 
 def get_openai_client(user_api_key: str = None):
     if user_api_key:
-        return OpenAI(api_key=user_api_key)
+        return OpenAI(api_key=user_api_key, max_retries=0)
     elif api_key:
-        return OpenAI(api_key=api_key)
+        return openai_client
     return None
 
+def get_async_openai_client(user_api_key: str = None):
+    if user_api_key:
+        return client_pool.get(user_api_key)
+    elif api_key:
+        return client_pool.get(api_key)
+    return None
+
+# Every model API call goes through the scheduler: concurrency limits (global
+# and per key), a bounded wait queue, retries and a circuit breaker. The SDK's
+# own retries are turned off so attempts aren't multiplied. The per-key limit
+# keeps one user's key from crowding out others; the server key serves every
+# request without its own key, so only the global limit applies to it.
+upstream_scheduler = UpstreamScheduler(
+    max_concurrency=int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "64")),
+    max_per_key=int(os.getenv("UPSTREAM_MAX_CONCURRENCY_PER_KEY", "8")),
+    unlimited_keys=[hash_api_key(api_key)] if api_key else [],
+    max_queue=int(os.getenv("UPSTREAM_QUEUE_SIZE", "256")),
+    queue_timeout=float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "10")),
+    max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+    backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5")),
+    backoff_max=float(os.getenv("UPSTREAM_BACKOFF_MAX", "8")),
+    breaker=CircuitBreaker(
+        threshold=int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+    )
+)
+
+def upstream_key(client: LLMClient) -> str:
+    return hash_api_key(getattr(client, "api_key", "") or "")
+
+async def create_chat_completion(client: LLMClient, section: str = "other", **kwargs):
+    # Async clients are awaited on the event loop; sync clients (scripts, tests)
+    # run in a worker thread so they never block the loop either.
+    model = kwargs.get("model", "")
+    key = upstream_key(client)
+    
+    async def attempt():
+        started = time.perf_counter()
+        try:
+            async with upstream_call(section, model):
+                if isinstance(client, AsyncOpenAI):
+                    response = await client.chat.completions.create(**kwargs)
+                else:
+                    response = await asyncio.to_thread(client.chat.completions.create, **kwargs)
+        except asyncio.CancelledError:
+            # A call that lost a hedge still took at least this long; dropping it
+            # would make the observed p95 shrink with every hedge.
+            section_latency.record(section, time.perf_counter() - started)
+            raise
+        section_latency.record(section, time.perf_counter() - started)
+        return response
+    
+    with tracing.span("upstream", section=section, model=model) as span:
+        def on_outcome(outcome: str) -> None:
+            metrics.hedges.inc(section=section, outcome=outcome)
+            span.set(hedge=outcome)
+        
+        # A backup request is only sent when it wouldn't make anyone else wait.
+        response = await hedged(
+            lambda: upstream_scheduler.call(key, attempt),
+            hedge_delay(section),
+            allow=lambda: upstream_scheduler.has_headroom(key),
+            on_outcome=on_outcome
+        )
+        usage = getattr(response, "usage", None)
+        span.set(prompt_tokens=getattr(usage, "prompt_tokens", None), completion_tokens=getattr(usage, "completion_tokens", None))
+    metrics.record_usage(section, model, usage)
+    if prefetcher is not None and is_background():
+        prefetcher.charge(usage)
+    return response
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Per-section model, max_tokens and temperature (SECTION_ROUTES JSON), and which
+# sections may send a backup request once they pass their observed p95 latency.
+section_routes = load_routes(os.getenv("SECTION_ROUTES"), DEFAULT_MODEL)
+section_latency = LatencyTracker(min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+
+def route_params(section: str) -> dict:
+    return section_routes[section].params()
+
+def section_model(section: str) -> str:
+    return section_routes[section].model if section in section_routes else DEFAULT_MODEL
+
+def hedge_delay(section: str) -> Optional[float]:
+    route = section_routes.get(section)
+    if route is None or not route.hedge:
+        return None
+    p95 = section_latency.percentile(section, 0.95)
+    return None if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+# Bump whenever a prompt or its parsing changes so cached sections are regenerated.
+PROMPT_VERSION = "1"
+
+# Opt-in: resolves scraped problems to a canonical id (URL slug confirmed by
+# SimHash, else nearest fingerprint) so near-duplicate scrapes share cache entries.
+problem_index = None
+if os.getenv("PROBLEM_DEDUP", "0").lower() in ("1", "true", "yes"):
+    problem_index = ProblemIndex(threshold=float(os.getenv("PROBLEM_SIMILARITY_THRESHOLD", "0.9")))
+
+def record_cache_hit(problem: Problem) -> None:
+    if problem_index is not None:
+        problem_index.record_cache_hit(problem)
+
+# "memory" keeps a per-process LRU; "sqlite" shares one on-disk cache between
+# all uvicorn workers on the host and survives restarts.
+response_cache = ResponseCache(
+    store=create_cache_store(
+        backend=os.getenv("RESPONSE_CACHE_BACKEND", "memory"),
+        path=os.getenv("RESPONSE_CACHE_PATH", "tutorai-cache.sqlite3"),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+        max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    ),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+    prompt_version=PROMPT_VERSION,
+    identify=problem_index.resolve if problem_index is not None else None
+)
+
+SECTION_DECODERS = {
+    "complexity": Complexity.model_validate,
+}
+
+def encode_section(value):
+    return value.model_dump() if isinstance(value, Complexity) else value
+
+def decode_section(section: str, value):
+    decode = SECTION_DECODERS.get(section)
+    return decode(value) if decode else value
+
+# Identical requests that arrive while a section (or a whole /tutoring response)
+# is still being generated wait for that upstream call instead of starting their own.
+section_flight = SingleFlight("sections")
+tutoring_flight = SingleFlight("tutoring")
+
+async def cached_section(section: str, problem: Problem, tags: Optional[List[str]], fetch: Callable[[], Awaitable], language: str = None, client: LLMClient = None):
+    with tracing.span("cached_section", section=section) as span:
+        key = response_cache.key(section, problem, tags, language, section_model(section))
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            span.set(cache="hit")
+            record_cache_hit(problem)
+            return decode_section(section, cached)
+        
+        async def fetch_and_store():
+            value = await fetch()
+            await response_cache.aset(key, encode_section(value))
+            return value
+        
+        # Only callers on the same API key share a call: the shared task runs
+        # with the leader's client, so its key errors, 429s and per-key limits
+        # must not reach anyone else. Results are still shared via the cache.
+        flight_key = f"{key}:{upstream_key(client)}"
+        span.set(cache="coalesced" if section_flight.is_in_flight(flight_key) else "miss")
+        return await section_flight.do(flight_key, fetch_and_store)
+
+# Token counts of the trimmed problem fields in each generation prompt.
+prompt_stats = PromptStats()
+
+def budget_problem(problem: Problem, section: str) -> Problem:
+    builder = PromptBuilder()
+    fitted = problem.model_copy(update={
+        "title": builder.text("title", problem.title),
+        "description": builder.text("description", problem.description)
+    })
+    prompt_stats.record(section, builder.report())
+    return fitted
+
+def run_sync(awaitable):
+    # Entry point for synchronous scripts, e.g.
+    # run_sync(generate_hints(problem, tags, get_openai_client()))
+    return asyncio.run(awaitable)
+
+# ETags on the endpoints whose JSON bodies are deterministic for a cached
+# problem, checked before the handler runs (see cached_etag), plus gzip/brotli
+# for large bodies everywhere. Streams are left alone.
+ETAG_PATHS = ("/tutoring", "/hints", "/plan", "/complexity", "/edge-cases", "/solution")
+response_compressor = BodyCompressor(min_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024")))
+
+async def cached_etag(path: str, body: bytes) -> Optional[str]:
+    # The validator of a response is the request plus the cached sections it is
+    # built from, so it can be checked before the handler runs. None when any of
+    # them isn't cached yet (the response may then be fallback content).
+    request_model, sources = ETAG_SOURCES[path]
+    try:
+        request = request_model.model_validate_json(body)
+    except ValueError:
+        return None
+    if getattr(request, "stream", False):
+        return None
+    problem = request.problem
+    tags = infer_tags(problem)
+    keys = [
+        response_cache.key(section, problem, tags if uses_tags else None, request.language if uses_language else None, section_model(section))
+        for section, uses_tags, uses_language in sources
+    ]
+    values = await asyncio.gather(*(response_cache.apeek(key) for key in keys))
+    if any(value is None for value in values):
+        return None
+    return content_etag(path.encode("utf-8") + b"\0" + body + b"\0" + dumps(values))
+
+app.add_middleware(ConditionalCompressionMiddleware, etag_paths=ETAG_PATHS, compressor=response_compressor, validator=cached_etag)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    # Shed load with a real status instead of fallback text, so clients back off.
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(int(exc.retry_after + 0.999))}
+    )
+
+FALLBACK_HINTS = ["Consider the problem step by step", "Think about the data structures you might need", "Start with a simple approach"]
+FALLBACK_PLAN = "1. Understand the problem\n2. Choose appropriate data structures\n3. Implement the solution\n4. Test with edge cases"
+FALLBACK_EDGE_CASES = ["Empty input", "Single element", "Large input", "Negative numbers"]
+FALLBACK_COMPLEXITY = Complexity(
+    time="O(n) - typically linear time",
+    space="O(n) - typically linear space",
+    rationale="Most problems require at least one pass through the data."
+)
+FALLBACK_SOLUTION = ""
+
+DISCLAIMER = "This guidance is for personal educational use only. Not affiliated with LeetCode."
+
+# Per-section deadlines (seconds) for /tutoring. TUTORING_SECTION_TIMEOUT sets the
+# default; TUTORING_<SECTION>_TIMEOUT (e.g. TUTORING_SOLUTION_TIMEOUT) overrides it.
+TUTORING_SECTIONS = ("hints", "plan", "edge_cases", "complexity", "solution")
+
+DEFAULT_SECTION_TIMEOUT = float(os.getenv("TUTORING_SECTION_TIMEOUT", "20"))
+SECTION_TIMEOUTS = {
+    section: float(os.getenv(f"TUTORING_{section.upper()}_TIMEOUT", DEFAULT_SECTION_TIMEOUT))
+    for section in TUTORING_SECTIONS
+}
+SECTION_TIMEOUTS["combined"] = float(os.getenv("TUTORING_COMBINED_TIMEOUT", "45"))
+
+# Request model and cached sections ((section, uses tags, uses language)) each
+# ETag path's response is built from.
+ETAG_SOURCES = {
+    "/tutoring": (TutoringRequest, [(section, section != "edge_cases", False) for section in TUTORING_SECTIONS]),
+    "/hints": (ProblemRequest, [("hints", True, False)]),
+    "/plan": (ProblemRequest, [("plan", True, False)]),
+    "/complexity": (ProblemRequest, [("complexity", True, False)]),
+    "/edge-cases": (ProblemRequest, [("edge_cases", False, False)]),
+    "/solution": (SolutionRequest, [("solution_in_language", True, True)]),
+}
+
+# "sections" asks for each section separately; "combined" asks once for a JSON
+# document and only regenerates sections that fail to parse.
+TUTORING_MODE = os.getenv("TUTORING_MODE", "sections")
 
 def infer_tags(problem: Problem) -> List[str]:
-    text = f"{problem.title} {problem.description}".lower()
-    tags = []
-    
-    if any(word in text for word in ['array', 'list', 'sequence']):
-        tags.append('array')
-    if any(word in text for word in ['string', 'text', 'character']):
-        tags.append('string')
-    
-    if any(word in text for word in ['hash', 'map', 'dictionary', 'key-value']):
-        tags.append('hash map')
-    if any(word in text for word in ['stack', 'push', 'pop']):
-        tags.append('stack')
-    if any(word in text for word in ['queue', 'heap', 'priority']):
-        tags.append('heap')
-    if any(word in text for word in ['tree', 'node', 'binary']):
-        tags.append('tree')
-    if any(word in text for word in ['graph', 'edge', 'vertex']):
-        tags.append('graph')
-    
-    if any(word in text for word in ['two pointer', 'two-pointer', 'pointer']):
-        tags.append('two pointers')
-    if any(word in text for word in ['binary search', 'search']):
-        tags.append('binary search')
-    if any(word in text for word in ['bfs', 'breadth', 'level']):
-        tags.append('BFS')
-    if any(word in text for word in ['dfs', 'depth', 'recursion']):
-        tags.append('DFS')
-    if any(word in text for word in ['dynamic programming', 'dp', 'memoization']):
-        tags.append('dynamic programming')
-    if any(word in text for word in ['greedy', 'optimal']):
-        tags.append('greedy')
-    if any(word in text for word in ['math', 'mathematical', 'number']):
-        tags.append('math')
-    
-    if not tags:
-        tags = ['array', 'string']
-    
-    return tags[:5]
-
-def generate_hints(problem: Problem, tags: List[str], client: OpenAI = None) -> List[str]:
-    if not client:
-        return ["AI hints not available - using fallback hints"]
+    with tracing.span("infer_tags"):
+        return tags_from_scores(score_tags(problem.title, problem.description))
+
+async def _fetch_hints(problem: Problem, tags: List[str], client: LLMClient) -> List[str]:
+    problem = budget_problem(problem, "hints")
     
-    try:
-        prompt = f"""Write 4-5 helpful hints for this coding problem.
+    prompt = f"""Write 4-5 helpful hints for this coding problem.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -91,28 +379,37 @@ Rules:
 
 Write one hint per line."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful programming tutor. Provide progressive hints that guide students toward solutions without giving away the complete answer."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        
-        ai_hints = response.choices[0].message.content.strip().split('\n')
-        return [hint.strip() for hint in ai_hints if hint.strip()][:5]
+    response = await create_chat_completion(
+        client,
+        section="hints",
+        **route_params("hints"),
+        messages=[
+            {"role": "system", "content": "You are a helpful programming tutor. Provide progressive hints that guide students toward solutions without giving away the complete answer."},
+            {"role": "user", "content": prompt}
+        ]
+    )
     
-    except Exception as e:
-        return ["AI hints not available - using fallback hints"]
+    ai_hints = response.choices[0].message.content.strip().split('\n')
+    return [hint.strip() for hint in ai_hints if hint.strip()][:5]
 
-def generate_plan(problem: Problem, tags: List[str], client: OpenAI = None) -> str:
+async def generate_hints(problem: Problem, tags: List[str], client: LLMClient = None) -> List[str]:
     if not client:
-        return "AI plan not available - using fallback plan"
+        record_fallback("hints", "no_client")
+        return ["AI hints not available - using fallback hints"]
     
     try:
-        prompt = f"""Write a step-by-step plan to solve this coding problem.
+        return await cached_section("hints", problem, tags, lambda: _fetch_hints(problem, tags, client), client=client)
+    
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        record_fallback("hints", "error")
+        return ["AI hints not available - using fallback hints"]
+
+async def _fetch_plan(problem: Problem, tags: List[str], client: LLMClient) -> str:
+    problem = budget_problem(problem, "plan")
+    
+    prompt = f"""Write a step-by-step plan to solve this coding problem.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -129,27 +426,36 @@ Use numbered lists (1. 2. 3.) and simple headers.
 DO NOT include edge cases - those belong in a separate section.
 DO NOT include time or space complexity analysis - that belongs in a separate section."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful programming tutor. Create clear, educational step-by-step plans for solving coding problems. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting. Do NOT include time complexity, space complexity, or complexity analysis in your plan - those belong in a separate complexity analysis section."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=250,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content.strip()
+    response = await create_chat_completion(
+        client,
+        section="plan",
+        **route_params("plan"),
+        messages=[
+            {"role": "system", "content": "You are a helpful programming tutor. Create clear, educational step-by-step plans for solving coding problems. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting. Do NOT include time complexity, space complexity, or complexity analysis in your plan - those belong in a separate complexity analysis section."},
+            {"role": "user", "content": prompt}
+        ]
+    )
     
-    except Exception as e:
-        return "AI plan not available - using fallback plan"
+    return response.choices[0].message.content.strip()
 
-def generate_edge_cases(problem: Problem, client: OpenAI = None) -> List[str]:
+async def generate_plan(problem: Problem, tags: List[str], client: LLMClient = None) -> str:
     if not client:
-        return ["AI edge cases not available - using fallback edge cases"]
+        record_fallback("plan", "no_client")
+        return "AI plan not available - using fallback plan"
     
     try:
-        prompt = f"""Write 4-5 edge cases for this coding problem.
+        return await cached_section("plan", problem, tags, lambda: _fetch_plan(problem, tags, client), client=client)
+    
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        record_fallback("plan", "error")
+        return "AI plan not available - using fallback plan"
+
+async def _fetch_edge_cases(problem: Problem, client: LLMClient) -> List[str]:
+    problem = budget_problem(problem, "edge_cases")
+    
+    prompt = f"""Write 4-5 edge cases for this coding problem.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -162,32 +468,37 @@ Requirements:
 
 Write one edge case per line."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful programming tutor. Generate specific edge cases that help students think about boundary conditions and testing."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        
-        ai_edge_cases = response.choices[0].message.content.strip().split('\n')
-        return [edge.strip() for edge in ai_edge_cases if edge.strip()][:5]
+    response = await create_chat_completion(
+        client,
+        section="edge_cases",
+        **route_params("edge_cases"),
+        messages=[
+            {"role": "system", "content": "You are a helpful programming tutor. Generate specific edge cases that help students think about boundary conditions and testing."},
+            {"role": "user", "content": prompt}
+        ]
+    )
     
-    except Exception as e:
-        return ["AI edge cases not available - using fallback edge cases"]
+    ai_edge_cases = response.choices[0].message.content.strip().split('\n')
+    return [edge.strip() for edge in ai_edge_cases if edge.strip()][:5]
 
-def analyze_complexity(problem: Problem, tags: List[str], client: OpenAI = None) -> Complexity:
+async def generate_edge_cases(problem: Problem, client: LLMClient = None) -> List[str]:
     if not client:
-        return Complexity(
-            time="AI analysis not available",
-            space="AI analysis not available",
-            rationale="Complexity analysis not available when AI is not configured."
-        )
+        record_fallback("edge_cases", "no_client")
+        return ["AI edge cases not available - using fallback edge cases"]
     
     try:
-        prompt = f"""Analyze the time and space complexity for this coding problem.
+        return await cached_section("edge_cases", problem, None, lambda: _fetch_edge_cases(problem, client), client=client)
+    
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        record_fallback("edge_cases", "error")
+        return ["AI edge cases not available - using fallback edge cases"]
+
+async def _fetch_complexity(problem: Problem, tags: List[str], client: LLMClient) -> Complexity:
+    problem = budget_problem(problem, "complexity")
+    
+    prompt = f"""Analyze the time and space complexity for this coding problem.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -203,50 +514,63 @@ Time: [complexity] - [explanation]
 Space: [complexity] - [explanation]
 Rationale: [explanation]"""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful programming tutor. Provide accurate complexity analysis with clear explanations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=250,
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        lines = content.split('\n')
-        time_complexity = "O(n) - AI analysis available"
-        space_complexity = "O(n) - AI analysis available"
-        rationale = "AI-generated complexity analysis"
-        
-        for line in lines:
-            if line.startswith("Time:"):
-                time_complexity = line.replace("Time:", "").strip()
-            elif line.startswith("Space:"):
-                space_complexity = line.replace("Space:", "").strip()
-            elif line.startswith("Rationale:"):
-                rationale = line.replace("Rationale:", "").strip()
-        
+    response = await create_chat_completion(
+        client,
+        section="complexity",
+        **route_params("complexity"),
+        messages=[
+            {"role": "system", "content": "You are a helpful programming tutor. Provide accurate complexity analysis with clear explanations."},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    
+    content = response.choices[0].message.content.strip()
+    
+    lines = content.split('\n')
+    time_complexity = "O(n) - AI analysis available"
+    space_complexity = "O(n) - AI analysis available"
+    rationale = "AI-generated complexity analysis"
+    
+    for line in lines:
+        if line.startswith("Time:"):
+            time_complexity = line.replace("Time:", "").strip()
+        elif line.startswith("Space:"):
+            space_complexity = line.replace("Space:", "").strip()
+        elif line.startswith("Rationale:"):
+            rationale = line.replace("Rationale:", "").strip()
+    
+    return Complexity(
+        time=time_complexity,
+        space=space_complexity,
+        rationale=rationale
+    )
+
+async def analyze_complexity(problem: Problem, tags: List[str], client: LLMClient = None) -> Complexity:
+    if not client:
+        record_fallback("complexity", "no_client")
         return Complexity(
-            time=time_complexity,
-            space=space_complexity,
-            rationale=rationale
+            time="AI analysis not available",
+            space="AI analysis not available",
+            rationale="Complexity analysis not available when AI is not configured."
         )
     
+    try:
+        return await cached_section("complexity", problem, tags, lambda: _fetch_complexity(problem, tags, client), client=client)
+    
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
+        record_fallback("complexity", "error")
         return Complexity(
             time="AI analysis not available",
             space="AI analysis not available",
             rationale="Complexity analysis not available due to AI error."
         )
 
-def generate_solution(problem: Problem, tags: List[str], client: OpenAI = None) -> str:
-    if not client:
-        return "AI solution not available - using fallback solution"
+async def _fetch_solution(problem: Problem, tags: List[str], client: LLMClient) -> str:
+    problem = budget_problem(problem, "solution")
     
-    try:
-        prompt = f"""Write a complete solution for this coding problem.
+    prompt = f"""Write a complete solution for this coding problem.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -261,51 +585,60 @@ Requirements:
 IMPORTANT: Write in plain text only. No HTML, no markdown, no special formatting.
 Use simple headers and indented code."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful programming tutor. Provide complete, working solutions with clear explanations and good coding practices. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content.strip()
+    response = await create_chat_completion(
+        client,
+        section="solution",
+        **route_params("solution"),
+        messages=[
+            {"role": "system", "content": "You are a helpful programming tutor. Provide complete, working solutions with clear explanations and good coding practices. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting."},
+            {"role": "user", "content": prompt}
+        ]
+    )
     
-    except Exception as e:
-        return "AI solution not available due to error."
+    return response.choices[0].message.content.strip()
 
-def generate_solution_in_language(problem: Problem, tags: List[str], language: str, client: OpenAI = None) -> str:
+async def generate_solution(problem: Problem, tags: List[str], client: LLMClient = None) -> str:
     if not client:
+        record_fallback("solution", "no_client")
         return "AI solution not available - using fallback solution"
     
     try:
-        language_map = {
-            "python": "Python",
-            "python3": "Python 3",
-            "javascript": "JavaScript",
-            "typescript": "TypeScript",
-            "java": "Java",
-            "cpp": "C++",
-            "c": "C",
-            "csharp": "C#",
-            "php": "PHP",
-            "swift": "Swift",
-            "kotlin": "Kotlin",
-            "dart": "Dart",
-            "go": "Go",
-            "ruby": "Ruby",
-            "scala": "Scala",
-            "rust": "Rust",
-            "racket": "Racket",
-            "erlang": "Erlang",
-            "elixir": "Elixir"
-        }
-        
-        language_name = language_map.get(language.lower(), language)
-        
-        prompt = f"""Write a complete solution for this coding problem in {language_name}.
+        return await cached_section("solution", problem, tags, lambda: _fetch_solution(problem, tags, client), client=client)
+    
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        record_fallback("solution", "error")
+        return "AI solution not available due to error."
+
+def solution_in_language_request(problem: Problem, tags: List[str], language: str) -> dict:
+    problem = budget_problem(problem, "solution_in_language")
+    
+    language_map = {
+        "python": "Python",
+        "python3": "Python 3",
+        "javascript": "JavaScript",
+        "typescript": "TypeScript",
+        "java": "Java",
+        "cpp": "C++",
+        "c": "C",
+        "csharp": "C#",
+        "php": "PHP",
+        "swift": "Swift",
+        "kotlin": "Kotlin",
+        "dart": "Dart",
+        "go": "Go",
+        "ruby": "Ruby",
+        "scala": "Scala",
+        "rust": "Rust",
+        "racket": "Racket",
+        "erlang": "Erlang",
+        "elixir": "Elixir"
+    }
+    
+    language_name = language_map.get(language.lower(), language)
+    
+    prompt = f"""Write a complete solution for this coding problem in {language_name}.
 
 Problem: {problem.title}
 Description: {problem.description}
@@ -323,108 +656,445 @@ Use simple headers and indented code.
 
 CRITICAL: DO NOT include any time complexity analysis, space complexity analysis, or complexity explanations in your response. Stop after providing the complete working solution. Do not add any text about "This solution has a time complexity of..." or similar complexity analysis."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+    return {
+        **route_params("solution_in_language"),
+        "messages": [
+            {"role": "system", "content": f"You are a helpful programming tutor. Provide complete, working {language_name} solutions with clear explanations and good coding practices. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting. CRITICAL: Never include time complexity analysis, space complexity analysis, or complexity explanations in your solution responses. Stop after providing the complete working solution."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+async def _fetch_solution_in_language(problem: Problem, tags: List[str], language: str, client: LLMClient) -> str:
+    response = await create_chat_completion(client, section="solution_in_language", **solution_in_language_request(problem, tags, language))
+    return response.choices[0].message.content.strip()
+
+async def generate_solution_in_language(problem: Problem, tags: List[str], language: str, client: LLMClient = None) -> str:
+    if not client:
+        record_fallback("solution_in_language", "no_client")
+        return "AI solution not available - using fallback solution"
+    
+    try:
+        return await cached_section("solution_in_language", problem, tags, lambda: _fetch_solution_in_language(problem, tags, language, client), language=language, client=client)
+    
+    except UpstreamOverloaded:
+        raise
+    except Exception as e:
+        record_fallback("solution_in_language", "error")
+        return f"AI solution not available due to error: {str(e)}"
+
+
+
+SECTION_GENERATORS = {
+    "hints": lambda problem, tags, client: generate_hints(problem, tags, client),
+    "plan": lambda problem, tags, client: generate_plan(problem, tags, client),
+    "edge_cases": lambda problem, tags, client: generate_edge_cases(problem, client),
+    "complexity": lambda problem, tags, client: analyze_complexity(problem, tags, client),
+    "solution": lambda problem, tags, client: generate_solution(problem, tags, client),
+}
+
+SECTION_FALLBACKS = {
+    "hints": FALLBACK_HINTS,
+    "plan": FALLBACK_PLAN,
+    "edge_cases": FALLBACK_EDGE_CASES,
+    "complexity": FALLBACK_COMPLEXITY,
+    "solution": FALLBACK_SOLUTION,
+    "combined": {},
+}
+
+async def with_deadline(section: str, awaitable):
+    with tracing.span("section", section=section, deadline_s=SECTION_TIMEOUTS[section]):
+        try:
+            return await asyncio.wait_for(awaitable, SECTION_TIMEOUTS[section])
+        except asyncio.TimeoutError:
+            record_fallback(section, "timeout")
+            return SECTION_FALLBACKS[section]
+
+async def generate_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, sections: Sequence[str] = TUTORING_SECTIONS) -> Dict[str, object]:
+    tasks = [
+        asyncio.ensure_future(with_deadline(section, SECTION_GENERATORS[section](problem, tags, client)))
+        for section in sections
+    ]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # Sections only raise to shed load (UpstreamOverloaded); the response
+        # is then a 429/503, so the other sections stop waiting on it. Calls
+        # shared with other requests keep running and still fill the cache.
+        for task in tasks:
+            task.cancel()
+    return dict(zip(sections, results))
+
+# Sections behind the per-section endpoints, in the order the extension asks for them.
+PREFETCH_SECTIONS = ("hints", "plan", "edge_cases", "complexity", "solution_in_language")
+# /solution's default, used for its prefetch when a request doesn't name a language.
+PREFETCH_LANGUAGE = os.getenv("PREFETCH_LANGUAGE", "python")
+
+async def schedule_prefetch(requested: str, problem: Problem, tags: List[str], client: LLMClient = None, language: str = None) -> None:
+    # After one per-section request, queue the sibling sections that aren't
+    # cached yet so the follow-up clicks are served from the cache. Only
+    # requests on the server key are prefetched for: a user's own key is never
+    # charged for sections they didn't ask for.
+    if prefetcher is None or not client or not api_key or getattr(client, "api_key", None) != api_key:
+        return
+    language = language or PREFETCH_LANGUAGE
+    fetchers = {
+        "hints": lambda: _fetch_hints(problem, tags, client),
+        "plan": lambda: _fetch_plan(problem, tags, client),
+        "edge_cases": lambda: _fetch_edge_cases(problem, client),
+        "complexity": lambda: _fetch_complexity(problem, tags, client),
+        "solution_in_language": lambda: _fetch_solution_in_language(problem, tags, language, client),
+    }
+    for section in PREFETCH_SECTIONS:
+        if section == requested:
+            continue
+        section_tags = None if section == "edge_cases" else tags
+        section_language = language if section == "solution_in_language" else None
+        key = response_cache.key(section, problem, section_tags, section_language, section_model(section))
+        if await response_cache.acontains(key):
+            continue
+        prefetcher.submit(key, lambda section=section, section_tags=section_tags, fetch=fetchers[section], section_language=section_language: cached_section(section, problem, section_tags, fetch, language=section_language, client=client))
+
+def _clean_lines(value) -> List[str]:
+    if not isinstance(value, list):
+        raise ValueError("expected a list of strings")
+    lines = [str(item).strip() for item in value if str(item).strip()]
+    if not lines:
+        raise ValueError("expected at least one non-empty string")
+    return lines[:5]
+
+def _clean_text(value) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected a non-empty string")
+    return value.strip()
+
+COMBINED_SECTION_PARSERS = {
+    "hints": _clean_lines,
+    "plan": _clean_text,
+    "edge_cases": _clean_lines,
+    "complexity": Complexity.model_validate,
+    "solution": _clean_text,
+}
+
+def section_cache_key(section: str, problem: Problem, tags: List[str]) -> str:
+    return response_cache.key(section, problem, None if section == "edge_cases" else tags, None, section_model(section))
+
+async def lookup_cached_sections(problem: Problem, tags: List[str], sections: Sequence[str] = TUTORING_SECTIONS) -> Dict[str, object]:
+    found = {}
+    values = await asyncio.gather(*(response_cache.aget(section_cache_key(section, problem, tags)) for section in sections))
+    for section, cached in zip(sections, values):
+        if cached is not None:
+            found[section] = decode_section(section, cached)
+    if found:
+        record_cache_hit(problem)
+    return found
+
+def parse_combined_sections(data) -> Dict[str, object]:
+    if not isinstance(data, dict):
+        return {}
+    
+    sections = {}
+    for section, parse in COMBINED_SECTION_PARSERS.items():
+        try:
+            sections[section] = parse(data.get(section))
+        except Exception:
+            continue
+    return sections
+
+async def generate_combined_sections(problem: Problem, tags: List[str], client: LLMClient = None) -> Dict[str, object]:
+    if not client:
+        return {}
+    
+    try:
+        # Only the prompt sees the trimmed text; the cache is keyed on the
+        # problem as received, which is what lookup_cached_sections uses.
+        prompt_problem = budget_problem(problem, "combined")
+        prompt = f"""Create tutoring material for this coding problem.
+
+Problem: {prompt_problem.title}
+Description: {prompt_problem.description}
+Tags: {', '.join(tags)}
+
+Return a single JSON object with exactly these keys:
+- "hints": array of 4-5 short progressive hints, general first and then more specific, without giving away the complete solution
+- "plan": string with a numbered step-by-step plan (1. 2. 3.) naming the data structures or algorithms to use; no edge cases and no complexity analysis
+- "edge_cases": array of 4-5 short edge cases specific to this problem, including boundary conditions
+- "complexity": object with string fields "time", "space" and "rationale"; format time and space as "[complexity] - [explanation]"
+- "solution": string with a complete, working Python solution using clear variable names and comments
+
+All string values must be plain text. No HTML and no markdown."""
+
+        response = await create_chat_completion(
+            client,
+            section="combined",
+            **route_params("combined"),
             messages=[
-                {"role": "system", "content": f"You are a helpful programming tutor. Provide complete, working {language_name} solutions with clear explanations and good coding practices. IMPORTANT: Always return plain text only - no HTML, no markdown, no special formatting. CRITICAL: Never include time complexity analysis, space complexity analysis, or complexity explanations in your solution responses. Stop after providing the complete working solution."},
+                {"role": "system", "content": "You are a helpful programming tutor. Always answer with a single valid JSON object and nothing else."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=500,
-            temperature=0.7
+            response_format={"type": "json_object"}
         )
         
-        return response.choices[0].message.content.strip()
+        sections = parse_combined_sections(json.loads(response.choices[0].message.content))
+        for section, value in sections.items():
+            await response_cache.aset(section_cache_key(section, problem, tags), encode_section(value))
+        return sections
     
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
-        return f"AI solution not available due to error: {str(e)}"
+        record_fallback("combined", "error")
+        return {}
 
+async def prefilled_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, mode: str = TUTORING_MODE) -> Dict[str, object]:
+    if mode != "combined":
+        return {}
+    sections = await lookup_cached_sections(problem, tags)
+    if len(sections) < len(TUTORING_SECTIONS):
+        combined = await with_deadline("combined", generate_combined_sections(problem, tags, client))
+        sections = {**combined, **sections}
+    return sections
 
+async def build_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, mode: str = TUTORING_MODE) -> Dict[str, object]:
+    sections = await prefilled_tutoring_sections(problem, tags, client, mode)
+    missing = [section for section in TUTORING_SECTIONS if section not in sections]
+    sections.update(await generate_tutoring_sections(problem, tags, client, missing))
+    return sections
 
-@app.post("/hints")
-async def get_hints(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    user_api_key = request.get("user_api_key")
+async def iter_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, mode: str = TUTORING_MODE) -> AsyncIterator[Tuple[str, object]]:
+    sections = await prefilled_tutoring_sections(problem, tags, client, mode)
+    for section in TUTORING_SECTIONS:
+        if section in sections:
+            yield section, sections[section]
+    
+    async def run(section: str):
+        return section, await with_deadline(section, SECTION_GENERATORS[section](problem, tags, client))
+    
+    tasks = [asyncio.ensure_future(run(section)) for section in TUTORING_SECTIONS if section not in sections]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, mode: str = TUTORING_MODE, fmt: str = "sse") -> AsyncIterator[str]:
+    started = time.perf_counter()
+    # problem_meta needs no LLM call, so the overlay can render it immediately.
+    yield format_event("problem_meta", ProblemMeta(title=problem.title, url=problem.url, tags=tags).model_dump(), fmt)
+    
+    try:
+        async for section, value in iter_tutoring_sections(problem, tags, client, mode):
+            yield format_event(section, {
+                section: encode_section(value),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            }, fmt)
+    except UpstreamOverloaded as e:
+        # Headers are already sent, so overload is reported in-band.
+        yield format_event("error", {"detail": e.detail, "status": e.status_code, "retry_after": e.retry_after}, fmt)
+        return
+    
+    yield format_event("done", {
+        "disclaimer": DISCLAIMER,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1)
+    }, fmt)
+
+async def coalesced_tutoring_sections(problem: Problem, tags: List[str], client: LLMClient = None, mode: str = TUTORING_MODE) -> Dict[str, object]:
+    key = response_cache.key(f"tutoring:{mode}", problem, tags, None, DEFAULT_MODEL)
+    # Keyed per API key for the same reason as cached_section.
+    key += f":{upstream_key(client)}" if client else ":fallback"
+    tracing.current_span().set(mode=mode, coalesced=tutoring_flight.is_in_flight(key))
+    return await tutoring_flight.do(key, lambda: build_tutoring_sections(problem, tags, client, mode))
+
+FALLBACK_SECTIONS = {section: SECTION_FALLBACKS[section] for section in TUTORING_SECTIONS}
+
+def build_hint_response(problem: Problem, tags: List[str], sections: Dict[str, object]) -> HintResponse:
+    return HintResponse(
+        problem_meta=ProblemMeta(
+            title=problem.title,
+            url=problem.url,
+            tags=tags
+        ),
+        hints=sections["hints"],
+        plan=sections["plan"],
+        edge_cases=sections["edge_cases"],
+        complexity=sections["complexity"],
+        solution=sections["solution"],
+        disclaimer=DISCLAIMER
+    )
+
+@app.post("/hints", response_model=HintsResponse)
+async def get_hints(request: ProblemRequest):
+    problem = request.problem
     
     try:
         tags = infer_tags(problem)
-        client = get_openai_client(user_api_key)
-        hints = generate_hints(problem, tags, client)
+        client = get_async_openai_client(request.user_api_key)
+        await schedule_prefetch("hints", problem, tags, client, request.language)
+        hints = await generate_hints(problem, tags, client)
         
         return {"hints": hints}
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         try:
-            fallback_hints = ["Consider the problem step by step", "Think about the data structures you might need", "Start with a simple approach"]
-            return {"hints": fallback_hints}
+            return {"hints": FALLBACK_HINTS}
         except Exception:
             raise HTTPException(status_code=500, detail=f"Failed to generate hints: {str(e)}")
 
 @app.post("/tutoring", response_model=HintResponse)
-async def get_tutoring(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    user_api_key = request.get("user_api_key")
+async def get_tutoring(request: TutoringRequest, http_request: Request):
+    problem = request.problem
+    mode = request.mode or TUTORING_MODE
     try:
         tags = infer_tags(problem)
         
-        client = get_openai_client(user_api_key)
+        client = get_async_openai_client(request.user_api_key)
         
-        hints = generate_hints(problem, tags, client)
-        plan = generate_plan(problem, tags, client)
-        edge_cases = generate_edge_cases(problem, client)
-        complexity = analyze_complexity(problem, tags, client)
-        solution = generate_solution(problem, tags, client)
+        # Progressive mode: send each section as an event as soon as it is ready.
+        if request.stream or "text/event-stream" in http_request.headers.get("accept", ""):
+            fmt = negotiate_stream_format(http_request)
+            return EventStreamResponse(stream_tutoring_sections(problem, tags, client, mode, fmt), fmt)
         
-        return HintResponse(
-            problem_meta=ProblemMeta(
-                title=problem.title,
-                url=problem.url,
-                tags=tags
-            ),
-            hints=hints,
-            plan=plan,
-            edge_cases=edge_cases,
-            complexity=complexity,
-            solution=solution,
-            disclaimer="This guidance is for personal educational use only. Not affiliated with LeetCode."
-        )
+        sections = await coalesced_tutoring_sections(problem, tags, client, mode)
+        
+        return build_hint_response(problem, tags, sections)
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         try:
             tags = infer_tags(problem)
-            fallback_hints = ["Consider the problem step by step", "Think about the data structures you might need", "Start with a simple approach"]
-            fallback_plan = "1. Understand the problem\n2. Choose appropriate data structures\n3. Implement the solution\n4. Test with edge cases"
-            fallback_edge_cases = ["Empty input", "Single element", "Large input", "Negative numbers"]
-            fallback_complexity = Complexity(
-                time="O(n) - typically linear time",
-                space="O(n) - typically linear space",
-                rationale="Most problems require at least one pass through the data."
-            )
             
-            return HintResponse(
-                problem_meta=ProblemMeta(
-                    title=problem.title,
-                    url=problem.url,
-                    tags=tags
-                ),
-                hints=fallback_hints,
-                plan=fallback_plan,
-                edge_cases=fallback_edge_cases,
-                complexity=fallback_complexity,
-                solution="",
-                disclaimer="This guidance is for personal educational use only. Not affiliated with LeetCode."
-            )
+            return build_hint_response(problem, tags, FALLBACK_SECTIONS)
         except Exception:
             raise HTTPException(status_code=500, detail=f"Failed to generate tutoring content: {str(e)}")
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_with_ai(message: ChatMessage):
-    user_api_key = getattr(message, 'user_api_key', None)
-    client = get_openai_client(user_api_key)
-    if not client:
-        raise HTTPException(status_code=503, detail="OpenAI API not available")
+# Upper bounds for /tutoring/batch: problems per request and problems generated at
+# once. Identical problems in a batch are generated once.
+TUTORING_BATCH_MAX_PROBLEMS = int(os.getenv("TUTORING_BATCH_MAX_PROBLEMS", "100"))
+TUTORING_BATCH_CONCURRENCY = int(os.getenv("TUTORING_BATCH_CONCURRENCY", "4"))
+
+async def iter_tutoring_batch(problems: List[Problem], client: LLMClient = None, mode: str = TUTORING_MODE, concurrency: int = TUTORING_BATCH_CONCURRENCY) -> AsyncIterator[Tuple[int, HintResponse]]:
+    groups: Dict[str, List[int]] = {}
+    unique: Dict[str, Tuple[Problem, List[str]]] = {}
+    for index, problem in enumerate(problems):
+        tags = infer_tags(problem)
+        key = response_cache.key("tutoring", problem, tags, None, DEFAULT_MODEL)
+        groups.setdefault(key, []).append(index)
+        unique.setdefault(key, (problem, tags))
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run(key: str):
+        problem, tags = unique[key]
+        async with semaphore:
+            try:
+                sections = await coalesced_tutoring_sections(problem, tags, client, mode)
+            except UpstreamOverloaded:
+                raise
+            except Exception as e:
+                sections = FALLBACK_SECTIONS
+        return key, tags, sections
     
+    tasks = [asyncio.ensure_future(run(key)) for key in unique]
     try:
-        current_language = getattr(message, 'current_language', 'python')
-        
-        system_prompt = f"""You are a helpful programming tutor specializing in {current_language}. Your job is to:
+        for next_done in asyncio.as_completed(tasks):
+            key, tags, sections = await next_done
+            for index in groups[key]:
+                yield index, build_hint_response(problems[index], tags, sections)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_tutoring_batch(problems: List[Problem], client: LLMClient = None, mode: str = TUTORING_MODE, concurrency: int = TUTORING_BATCH_CONCURRENCY, fmt: str = "sse") -> AsyncIterator[str]:
+    started = time.perf_counter()
+    try:
+        async for index, response in iter_tutoring_batch(problems, client, mode, concurrency):
+            yield format_event("result", {"index": index, "response": response.model_dump()}, fmt)
+    except UpstreamOverloaded as e:
+        yield format_event("error", {"detail": e.detail, "status": e.status_code, "retry_after": e.retry_after}, fmt)
+        return
+    yield format_event("done", {
+        "count": len(problems),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1)
+    }, fmt)
+
+@app.post("/tutoring/batch", response_model=List[HintResponse])
+async def get_tutoring_batch(request: TutoringBatchRequest, http_request: Request):
+    problems = request.problems
+    if len(problems) > TUTORING_BATCH_MAX_PROBLEMS:
+        raise HTTPException(status_code=413, detail=f"At most {TUTORING_BATCH_MAX_PROBLEMS} problems per batch")
+    
+    mode = request.mode or TUTORING_MODE
+    concurrency = min(request.concurrency or TUTORING_BATCH_CONCURRENCY, TUTORING_BATCH_CONCURRENCY)
+    client = get_async_openai_client(request.user_api_key)
+    
+    # Streaming mode emits results as they complete, each tagged with its index.
+    if request.stream or "text/event-stream" in http_request.headers.get("accept", ""):
+        fmt = negotiate_stream_format(http_request)
+        return EventStreamResponse(stream_tutoring_batch(problems, client, mode, concurrency, fmt), fmt)
+    
+    results: List[Optional[HintResponse]] = [None] * len(problems)
+    async for index, response in iter_tutoring_batch(problems, client, mode, concurrency):
+        results[index] = response
+    return results
+
+# Server-side chat sessions: the extension sends the problem context once, then
+# only the question plus editor diffs; the last few turns are kept as history.
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.getenv("CHAT_SESSION_MAX", "5000")),
+    ttl=float(os.getenv("CHAT_SESSION_TTL", "3600")),
+    max_turns=int(os.getenv("CHAT_SESSION_MAX_TURNS", "6"))
+)
+
+def resolve_chat_session(message: ChatMessage) -> Optional[ChatSession]:
+    if not message.session_id:
+        if message.problem_context is None:
+            raise HTTPException(status_code=400, detail="Either problem_context or session_id is required")
+        return None
+    
+    session = chat_sessions.get(message.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    try:
+        session.update(
+            problem_context=message.problem_context,
+            dom_elements=message.dom_elements,
+            editor_edits=message.editor_edits,
+            base_hash=message.editor_base_hash,
+            language=message.current_language
+        )
+    except EditorConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "editor_hash": e.server_hash})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return session
+
+def chat_completion_request(message: ChatMessage, session: ChatSession = None, builder: PromptBuilder = None) -> dict:
+    current_language = getattr(message, 'current_language', 'python')
+    problem_context = message.problem_context
+    dom_elements = message.dom_elements
+    history = []
+    if session is not None:
+        current_language = current_language or session.language
+        problem_context = session.problem_context
+        dom_elements = session.dom_elements
+        history = session.history_messages()
+    
+    # Every variable field gets a token budget; the editor keeps the code around
+    # the cursor, examples keep the first ones, history drops the oldest turns.
+    builder = builder or PromptBuilder()
+    problem_context = builder.text("problem_context", problem_context)
+    question = builder.text("question", message.content)
+    history = builder.history(history)
+    if dom_elements:
+        dom_elements = dict(dom_elements)
+        for field in ("title", "description", "constraints"):
+            dom_elements[field] = builder.text(field, dom_elements.get(field, 'Not available'))
+        dom_elements["examples"] = builder.examples("examples", dom_elements.get("examples", 'Not available'))
+        dom_elements["codeEditor"] = builder.code("codeEditor", dom_elements.get("codeEditor", 'Not available'), dom_elements.get("cursorOffset"))
+        dom_elements["testCases"] = builder.text("testCases", dom_elements.get("testCases", 'Not available'), from_end=True)
+    
+    system_prompt = f"""You are a helpful programming tutor specializing in {current_language}. Your job is to:
 
 1. Guide students through problem-solving in {current_language}
 2. Give hints without giving away complete solutions
@@ -437,23 +1107,23 @@ async def chat_with_ai(message: ChatMessage):
 CRITICAL: Always respond with guidance and code examples in {current_language} only. If the student is working in {current_language}, do not show them solutions in other languages.
 
 Goal: Help students learn {current_language}, don't solve for them."""
-        
-        dom_context = ""
-        if message.dom_elements:
-            dom_context = f"""
+    
+    dom_context = ""
+    if dom_elements:
+        dom_context = f"""
 DOM Context:
-- Title: {message.dom_elements.get('title', 'Not available')}
-- Description: {message.dom_elements.get('description', 'Not available')}
-- Examples: {message.dom_elements.get('examples', 'Not available')}
-- Constraints: {message.dom_elements.get('constraints', 'Not available')}
-- Code Editor Content: {message.dom_elements.get('codeEditor', 'Not available')}
-- Test Cases: {message.dom_elements.get('testCases', 'Not available')}
+- Title: {dom_elements.get('title', 'Not available')}
+- Description: {dom_elements.get('description', 'Not available')}
+- Examples: {dom_elements.get('examples', 'Not available')}
+- Constraints: {dom_elements.get('constraints', 'Not available')}
+- Code Editor Content: {dom_elements.get('codeEditor', 'Not available')}
+- Test Cases: {dom_elements.get('testCases', 'Not available')}
 """
-        
-        user_prompt = f"""Problem Context: {message.problem_context}{dom_context}
+    
+    user_prompt = f"""Problem Context: {problem_context}{dom_context}
 Current Language: {current_language}
 
-Student's Question: {message.content}
+Student's Question: {question}
 
 IMPORTANT: The student is working in {current_language}. Provide ALL guidance and code examples in {current_language} only.
 
@@ -467,85 +1137,288 @@ Give helpful guidance that:
 
 Remember: The student is coding in {current_language}, so all examples and guidance must be in {current_language}."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
+    return {
+        **route_params("chat"),
+        "messages": builder.measure([
+            {"role": "system", "content": system_prompt},
+            *history,
+            {"role": "user", "content": user_prompt}
+        ])
+    }
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_with_ai(message: ChatMessage):
+    user_api_key = getattr(message, 'user_api_key', None)
+    client = get_async_openai_client(user_api_key)
+    if not client:
+        raise HTTPException(status_code=503, detail="OpenAI API not available")
+    
+    session = resolve_chat_session(message)
+    try:
+        builder = PromptBuilder()
+        response = await create_chat_completion(client, section="chat", **chat_completion_request(message, session, builder))
+        prompt_stats.record("chat", builder.report())
         
         ai_response = response.choices[0].message.content.strip()
         
+        if session is None:
+            return ChatResponse(
+                message=ai_response,
+                timestamp=message.timestamp,
+                prompt_tokens=builder.report()
+            )
+        
+        session.add_turn(message.content, ai_response)
         return ChatResponse(
             message=ai_response,
-            timestamp=message.timestamp
+            timestamp=message.timestamp,
+            session_id=session.session_id,
+            editor_hash=session.editor_hash,
+            prompt_tokens=builder.report()
         )
     
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate chat response: {str(e)}")
 
-@app.post("/solution")
-async def get_solution(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    language = request.get("language", "python")
-    user_api_key = request.get("user_api_key")
+@app.post("/solution", response_model=SolutionResponse)
+async def get_solution(request: SolutionRequest):
+    problem = request.problem
+    language = request.language
     
-    client = get_openai_client(user_api_key)
+    client = get_async_openai_client(request.user_api_key)
     if not client:
         raise HTTPException(status_code=503, detail="OpenAI API not available")
     
     try:
         tags = infer_tags(problem)
-        solution = generate_solution_in_language(problem, tags, language, client)
+        await schedule_prefetch("solution_in_language", problem, tags, client, language)
+        solution = await generate_solution_in_language(problem, tags, language, client)
         
         return {"solution": solution}
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate solution: {str(e)}")
 
-@app.post("/plan")
-async def get_plan(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    user_api_key = request.get("user_api_key")
+@app.post("/chat/stream")
+async def chat_with_ai_stream(message: ChatMessage, request: Request):
+    client = get_async_openai_client(message.user_api_key)
+    if not client:
+        raise HTTPException(status_code=503, detail="OpenAI API not available")
+    
+    session = resolve_chat_session(message)
+    extra = {"timestamp": message.timestamp}
+    on_complete = None
+    if session is not None:
+        extra.update(session_id=session.session_id, editor_hash=session.editor_hash)
+        on_complete = lambda answer: session.add_turn(message.content, answer)
+    
+    builder = PromptBuilder()
+    completion_request = chat_completion_request(message, session, builder)
+    extra["prompt_tokens"] = builder.report()
+    prompt_stats.record("chat", extra["prompt_tokens"])
+    
+    # The slot is taken before the response starts, so overload is a real 429/503.
+    lease = await upstream_scheduler.acquire(upstream_key(client))
+    fmt = negotiate_stream_format(request)
+    return EventStreamResponse(
+        stream_chat_completion(client, fmt, on_complete=on_complete, extra=extra, section="chat", lease=lease, retrying=upstream_scheduler.retrying, **completion_request),
+        fmt,
+        on_close=lease.release
+    )
+
+@app.post("/chat/sessions", response_model=ChatSessionInfo)
+async def create_chat_session(request: ChatSessionCreate):
+    session = chat_sessions.create(request.problem_context, request.dom_elements, request.current_language)
+    return ChatSessionInfo(
+        session_id=session.session_id,
+        editor_hash=session.editor_hash,
+        max_turns=chat_sessions.max_turns,
+        ttl=int(chat_sessions.ttl)
+    )
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"deleted": session_id}
+
+@app.post("/solution/stream")
+async def get_solution_stream(payload: SolutionRequest, request: Request):
+    problem = payload.problem
+    language = payload.language
+    
+    client = get_async_openai_client(payload.user_api_key)
+    if not client:
+        raise HTTPException(status_code=503, detail="OpenAI API not available")
+    
+    fmt = negotiate_stream_format(request)
+    tags = infer_tags(problem)
+    await schedule_prefetch("solution_in_language", problem, tags, client, language)
+    key = response_cache.key("solution_in_language", problem, tags, language, section_model("solution_in_language"))
+    cached = await response_cache.aget(key)
+    if cached is not None:
+        record_cache_hit(problem)
+        return EventStreamResponse(replay_text(cached, fmt), fmt)
+    
+    lease = await upstream_scheduler.acquire(upstream_key(client))
+    return EventStreamResponse(
+        stream_chat_completion(
+            client,
+            fmt,
+            on_complete=lambda solution: response_cache.aset(key, solution),
+            section="solution_in_language",
+            lease=lease,
+            retrying=upstream_scheduler.retrying,
+            **solution_in_language_request(problem, tags, language)
+        ),
+        fmt,
+        on_close=lease.release
+    )
+
+@app.post("/plan", response_model=PlanResponse)
+async def get_plan(request: ProblemRequest):
+    problem = request.problem
     
     try:
         tags = infer_tags(problem)
-        client = get_openai_client(user_api_key)
-        plan = generate_plan(problem, tags, client)
+        client = get_async_openai_client(request.user_api_key)
+        await schedule_prefetch("plan", problem, tags, client, request.language)
+        plan = await generate_plan(problem, tags, client)
         
         return {"plan": plan}
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate plan: {str(e)}")
 
-@app.post("/complexity")
-async def get_complexity(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    user_api_key = request.get("user_api_key")
+@app.post("/complexity", response_model=ComplexityResponse)
+async def get_complexity(request: ProblemRequest):
+    problem = request.problem
     
     try:
         tags = infer_tags(problem)
-        client = get_openai_client(user_api_key)
-        complexity = analyze_complexity(problem, tags, client)
+        client = get_async_openai_client(request.user_api_key)
+        await schedule_prefetch("complexity", problem, tags, client, request.language)
+        complexity = await analyze_complexity(problem, tags, client)
         
         return {"complexity": complexity}
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate complexity analysis: {str(e)}")
 
-@app.post("/edge-cases")
-async def get_edge_cases(request: dict):
-    problem = Problem(**request.get("problem", {}))
-    user_api_key = request.get("user_api_key")
+@app.post("/edge-cases", response_model=EdgeCasesResponse)
+async def get_edge_cases(request: ProblemRequest):
+    problem = request.problem
     
     try:
-        client = get_openai_client(user_api_key)
-        edge_cases = generate_edge_cases(problem, client)
+        client = get_async_openai_client(request.user_api_key)
+        await schedule_prefetch("edge_cases", problem, infer_tags(problem), client, request.language)
+        edge_cases = await generate_edge_cases(problem, client)
         
         return {"edge_cases": edge_cases}
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate edge cases: {str(e)}")
 
+# Batches above this size are tagged on a worker thread to keep the event loop free.
+TAG_BATCH_THREAD_THRESHOLD = 256
+
+@app.post("/tags/batch", response_model=TagBatchResponse)
+async def get_tags_batch(request: TagBatchRequest):
+    problems = request.problems
+    
+    items = [(problem.title, problem.description) for problem in problems]
+    if len(items) > TAG_BATCH_THREAD_THRESHOLD:
+        scored = await asyncio.to_thread(tag_many, items)
+    else:
+        scored = tag_many(items)
+    
+    return {
+        "results": [
+            {"url": problem.url, "tags": tags_from_scores(scores), "scores": dict(scores)}
+            for problem, scores in zip(problems, scored)
+        ]
+    }
+
+@app.get("/routes")
+async def get_routes():
+    latency = section_latency.stats()
+    return {
+        section: {**route.to_dict(), "latency": latency.get(section)}
+        for section, route in section_routes.items()
+    }
+
+@app.get("/prompts/stats")
+async def get_prompt_stats():
+    return prompt_stats.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = await response_cache.astats()
+    stats["singleflight"] = {
+        flight.name: flight.stats() for flight in (section_flight, tutoring_flight)
+    }
+    if problem_index is not None:
+        stats["dedup"] = problem_index.stats()
+    if prefetcher is not None:
+        stats["prefetch"] = prefetcher.stats()
+    stats["compression"] = response_compressor.stats()
+    return stats
+
+@metrics.registry.collector
+def collect_component_stats():
+    # Stats the components already keep, read at scrape time.
+    yield "cache", "gauge", "Response cache counters and store size.", [
+        ({"stat": stat}, value) for stat, value in numeric_stats(response_cache.stats()).items()
+    ]
+    yield "singleflight", "gauge", "Coalesced in-flight requests per flight.", [
+        ({"flight": flight.name, "stat": stat}, value)
+        for flight in (section_flight, tutoring_flight)
+        for stat, value in numeric_stats(flight.stats()).items()
+    ]
+    if problem_index is not None:
+        yield "problem_dedup", "gauge", "Near-duplicate problem index: lookups, merges and cache hits they produced.", [
+            ({"stat": stat}, value) for stat, value in numeric_stats(problem_index.stats()).items()
+        ]
+    if prefetcher is not None:
+        yield "prefetch", "gauge", "Speculative section prefetch: queued, completed and dropped jobs, token spend.", [
+            ({"stat": stat}, value) for stat, value in numeric_stats(prefetcher.stats()).items()
+        ]
+    yield "http_compression", "gauge", "Conditional GET and response compression: 304s, compressed bodies and bytes saved.", [
+        ({"stat": stat}, value) for stat, value in numeric_stats(response_compressor.stats()).items()
+    ]
+    if tracer.enabled:
+        yield "tracing", "gauge", "Sampled traces and exported, dropped and failed spans.", [
+            ({"stat": stat}, value) for stat, value in numeric_stats({"traces": tracer.traces, **tracer.exporter.stats()}).items()
+        ]
+    yield "upstream_scheduler", "gauge", "Upstream admission control: active, queued and shed calls, retries, circuit opens.", [
+        ({"stat": stat}, value) for stat, value in numeric_stats(upstream_scheduler.stats()).items()
+    ]
+    yield "upstream_circuit_open", "gauge", "1 while the circuit breaker is open or half open.", [
+        ({}, 0 if upstream_scheduler.breaker.state == "closed" else 1)
+    ]
+    yield "client_pool", "gauge", "Pooled API clients and connection limits.", [
+        ({"stat": stat}, value) for stat, value in numeric_stats(client_pool.stats()).items()
+    ]
+    yield "chat_sessions", "gauge", "Server-side chat sessions.", [
+        ({"stat": stat}, value) for stat, value in numeric_stats(chat_sessions.stats()).items()
+    ]
+    yield "prompt_tokens", "gauge", "Budgeted prompt tokens, prompts and trimmed prompts per section.", [
+        ({"section": section, "stat": stat}, value)
+        for section, stats in prompt_stats.stats().items()
+        for stat, value in stats.items()
+    ]
+
+@app.get("/metrics")
+async def get_metrics():
+    # Collectors read the cache store's stats, which may hit the database.
+    return Response(content=await asyncio.to_thread(metrics.registry.render), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "TutorAI API"}
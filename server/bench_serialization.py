@@ -0,0 +1,128 @@
+"""Micro-benchmark of request parsing and response serialization per endpoint.
+
+Usage:
+    python bench_serialization.py --repeat 5 > serialization.json
+
+Times what the server does around the model call: validating a typical request
+body into its Pydantic model, and rendering a typical response body three ways
+(the standard library encoder, FastJSONResponse with orjson when installed, and
+Pydantic's own JSON serializer, which FastAPI uses for routes with a response
+model). Prints one JSON report with microseconds per operation; nothing is
+sent over the network.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmark import chat_message, problem
+from models import (
+    ChatMessage, ChatResponse, Complexity, ComplexityResponse, EdgeCasesResponse, HintResponse, HintsResponse,
+    PlanResponse, ProblemMeta, ProblemRequest, SolutionRequest, SolutionResponse, TagBatchRequest, TagBatchResponse,
+    TutoringBatchRequest, TutoringRequest
+)
+import serialization
+from serialization import FastJSONResponse
+
+HINTS = [f"Hint {index}: think about which values you have already seen and how to look them up quickly." for index in range(5)]
+PLAN = "\n".join(f"{index}. Step {index} of the plan, described in a sentence or two." for index in range(1, 7))
+EDGE_CASES = ["Empty input", "Single element", "Duplicate values", "Negative numbers", "No valid pair"]
+COMPLEXITY = Complexity(time="O(n) - each element is visited once", space="O(n) - the map holds up to n entries", rationale="One pass with constant-time lookups.")
+SOLUTION = "\n".join(f"    line_{index} = compute(nums, target, {index})  # explanation of step {index}" for index in range(40))
+
+
+def hint_response(index: int) -> HintResponse:
+    return HintResponse(
+        problem_meta=ProblemMeta(title=f"Benchmark Two Sum {index}", url=f"https://example.com/problems/bench-{index}", tags=["array", "hash-table"]),
+        hints=HINTS,
+        plan=PLAN,
+        edge_cases=EDGE_CASES,
+        complexity=COMPLEXITY,
+        solution=SOLUTION,
+        disclaimer="This guidance is for personal educational use only."
+    )
+
+
+# Endpoint name -> (request model, request body, response annotation, response value).
+CASES: Dict[str, tuple] = {
+    "hints": (ProblemRequest, {"problem": problem(1)}, HintsResponse, HintsResponse(hints=HINTS)),
+    "plan": (ProblemRequest, {"problem": problem(1)}, PlanResponse, PlanResponse(plan=PLAN)),
+    "edge_cases": (ProblemRequest, {"problem": problem(1)}, EdgeCasesResponse, EdgeCasesResponse(edge_cases=EDGE_CASES)),
+    "complexity": (ProblemRequest, {"problem": problem(1)}, ComplexityResponse, ComplexityResponse(complexity=COMPLEXITY)),
+    "solution": (SolutionRequest, {"problem": problem(1), "language": "java"}, SolutionResponse, SolutionResponse(solution=SOLUTION)),
+    "tutoring": (TutoringRequest, {"problem": problem(1)}, HintResponse, hint_response(1)),
+    "tutoring_batch": (TutoringBatchRequest, {"problems": [problem(index) for index in range(10)]}, List[HintResponse], [hint_response(index) for index in range(10)]),
+    "chat": (ChatMessage, chat_message(1), ChatResponse, ChatResponse(message=SOLUTION, timestamp="2024-01-01T00:00:00", session_id="0" * 32, editor_hash="f" * 16)),
+    "tags_batch": (TagBatchRequest, {"problems": [problem(index) for index in range(100)]}, TagBatchResponse, TagBatchResponse(results=[
+        {"url": f"https://example.com/problems/bench-{index}", "tags": ["array", "hash-table"], "scores": {"array": 4.0, "hash-table": 2.0}}
+        for index in range(100)
+    ])),
+}
+
+
+def per_call_us(fn: Callable[[], Any], repeat: int) -> float:
+    # Best of ``repeat`` runs, each long enough (~0.2 s) to average out timer noise.
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, 2)
+
+
+def measure(name: str, repeat: int) -> Dict[str, Any]:
+    request_model, body, annotation, value = CASES[name]
+    raw = json.dumps(body).encode("utf-8")
+    adapter = TypeAdapter(annotation)
+    encoded = jsonable_encoder(value)
+    return {
+        "endpoint": name,
+        "request_bytes": len(raw),
+        "response_bytes": len(adapter.dump_json(value)),
+        # FastAPI decodes the body and validates the resulting dict.
+        "parse_us": per_call_us(lambda: request_model.model_validate(json.loads(raw)), repeat),
+        "parse_json_us": per_call_us(lambda: request_model.model_validate_json(raw), repeat),
+        # Routes without a response model: jsonable_encoder, then render.
+        "serialize_stdlib_us": per_call_us(lambda: JSONResponse(jsonable_encoder(value)).body, repeat),
+        "serialize_fast_us": per_call_us(lambda: FastJSONResponse(jsonable_encoder(value)).body, repeat),
+        "render_only_stdlib_us": per_call_us(lambda: JSONResponse(encoded).body, repeat),
+        "render_only_fast_us": per_call_us(lambda: FastJSONResponse(encoded).body, repeat),
+        # Routes with a response model on recent FastAPI: straight to bytes.
+        "serialize_pydantic_us": per_call_us(lambda: adapter.dump_json(value), repeat),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure request parsing and response serialization per endpoint.")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per measurement, best is reported (default 5)")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    results = []
+    for name in args.endpoints:
+        result = measure(name, args.repeat)
+        results.append(result)
+        print(f"{name}: parse {result['parse_us']} us, serialize {result['serialize_stdlib_us']} us stdlib / {result['serialize_fast_us']} us fast / {result['serialize_pydantic_us']} us pydantic", file=sys.stderr)
+    report = {
+        "results": results,
+        "config": {"repeat": args.repeat, "orjson": serialization.orjson is not None},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
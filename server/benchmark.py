@@ -0,0 +1,274 @@
+"""Load test the server against a local stub of the chat completions API.
+
+Usage:
+    python benchmark.py --levels 1 8 32 --requests 200 --latency 0.4 --jitter 0.1 > bench.json
+
+Starts stub_llm.py and the server as subprocesses on free local ports (the
+server gets OPENAI_BASE_URL pointed at the stub and an in-memory cache), then
+drives each endpoint at each concurrency level and prints one JSON report with
+throughput, p50/p95/p99 latency, error counts and the server's event-loop lag.
+No network access or API key is needed, so runs are comparable across machines
+and between commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# The HTTP client the openai SDK itself runs on (httpx or httpx2; same API).
+from clients import http_library as httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DESCRIPTION = (
+    "Given an array of integers nums and an integer target, return indices of the two numbers "
+    "such that they add up to target. Each input has exactly one solution and the same element "
+    "may not be used twice. Variant {index}."
+)
+
+
+def problem(index: int) -> dict:
+    return {"title": f"Benchmark Two Sum {index}", "description": DESCRIPTION.format(index=index), "url": f"https://example.com/problems/bench-{index}"}
+
+
+def chat_message(index: int) -> dict:
+    return {
+        "content": "How should I start thinking about this problem?",
+        "problem_context": f"Benchmark Two Sum {index}",
+        "dom_elements": {"title": f"Benchmark Two Sum {index}", "description": DESCRIPTION.format(index=index), "codeEditor": "def solve(nums, target):\n    pass"},
+        "current_language": "python",
+    }
+
+
+# Endpoint name -> (path, payload builder). Payloads vary with the index so each
+# request is a cache miss unless --distinct limits the number of problems.
+ENDPOINTS: Dict[str, tuple] = {
+    "tutoring": ("/tutoring", lambda index: {"problem": problem(index)}),
+    "tutoring_stream": ("/tutoring", lambda index: {"problem": problem(index), "stream": True}),
+    "tutoring_combined": ("/tutoring", lambda index: {"problem": problem(index), "mode": "combined"}),
+    "chat": ("/chat", chat_message),
+    "chat_stream": ("/chat/stream", chat_message),
+    "solution": ("/solution", lambda index: {"problem": problem(index), "language": "java"}),
+    "solution_stream": ("/solution/stream", lambda index: {"problem": problem(index), "language": "java"}),
+    "hints": ("/hints", lambda index: {"problem": problem(index)}),
+    "plan": ("/plan", lambda index: {"problem": problem(index)}),
+    "complexity": ("/complexity", lambda index: {"problem": problem(index)}),
+    "edge_cases": ("/edge-cases", lambda index: {"problem": problem(index)}),
+    "tags_batch": ("/tags/batch", lambda index: {"problems": [problem(index * 100 + offset) for offset in range(100)]}),
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    # Nearest-rank percentile; values must be sorted.
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+    }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps for ``interval``."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+            if len(self.samples) > 100_000:
+                del self.samples[:50_000]
+
+    def ensure_started(self) -> None:
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def report(self, reset: bool = False) -> Dict[str, Any]:
+        samples, ordered = self.samples, sorted(self.samples)
+        if reset:
+            self.samples = []
+        return {
+            "samples": len(samples),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+        }
+
+
+def serve_app(port: int) -> None:
+    # Runs in the server subprocess: the real app plus a loop-lag probe route.
+    import uvicorn
+
+    sys.path.insert(0, HERE)
+    import app as server
+
+    monitor = LoopLagMonitor()
+
+    @server.app.get("/_bench/loop-lag", include_in_schema=False)
+    async def loop_lag(reset: bool = False):
+        monitor.ensure_started()
+        return monitor.report(reset)
+
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient, url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get(url)).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+        await asyncio.sleep(0.1)
+
+
+async def wait_for_stub(port: int) -> None:
+    async with httpx.AsyncClient() as client:
+        await wait_until_up(client, f"http://127.0.0.1:{port}/stats")
+
+
+async def run_level(client: httpx.AsyncClient, base_url: str, path: str, payload: Callable[[int], dict], concurrency: int, requests: int, offset: int, distinct: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for number in counter:
+            index = offset + number if not distinct else number % distinct
+            started = time.perf_counter()
+            try:
+                # Streams are read to the end, so latency covers the whole response.
+                async with client.stream("POST", base_url + path, json=payload(index)) as response:
+                    async for _ in response.aiter_bytes():
+                        pass
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        **summarize(latencies),
+    }
+
+
+async def benchmark(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=max(args.levels) * 2, max_keepalive_connections=max(args.levels) * 2)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await wait_until_up(client, base_url + "/health")
+        await client.get(base_url + "/_bench/loop-lag", params={"reset": "true"})
+        results = []
+        offset = 0
+        for name in args.endpoints:
+            path, payload = ENDPOINTS[name]
+            for concurrency in args.levels:
+                await client.get(base_url + "/_bench/loop-lag", params={"reset": "true"})
+                result = await run_level(client, base_url, path, payload, concurrency, args.requests, offset, args.distinct)
+                result["endpoint"] = name
+                result["loop_lag"] = (await client.get(base_url + "/_bench/loop-lag", params={"reset": "true"})).json()
+                results.append(result)
+                offset += args.requests
+                print(f"{name} c={concurrency}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, errors {result['errors']}", file=sys.stderr)
+        return {"results": results}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the TutorAI server against a local stub LLM.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32], help="concurrency levels (default 1 8 32)")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and level (default 100)")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=["tutoring", "tutoring_stream", "chat", "chat_stream", "solution", "hints"])
+    parser.add_argument("--distinct", type=int, default=0, help="cycle through this many problems to exercise the cache (default 0: every request distinct)")
+    parser.add_argument("--latency", type=float, default=0.4, help="stub mean completion latency in seconds (default 0.4)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="stub latency standard deviation in seconds (default 0.1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls that fail with HTTP 500 (default 0)")
+    parser.add_argument("--ttft", type=float, default=0.15, help="stub time to first streamed chunk in seconds (default 0.15)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per request in seconds (default 120)")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--serve-app", type=int, default=None, metavar="PORT", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.serve_app:
+        serve_app(args.serve_app)
+        return
+
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "stub_llm.py"), "--port", str(stub_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--ttft", str(args.ttft), "--seed", str(args.seed)
+    ])
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-benchmark",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1",
+        RESPONSE_CACHE_BACKEND="memory"
+    )
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-app", str(app_port)], cwd=HERE, env=env)
+    try:
+        asyncio.run(wait_for_stub(stub_port))
+        report = asyncio.run(benchmark(args, f"http://127.0.0.1:{app_port}"))
+    finally:
+        for process in (server, stub):
+            process.terminate()
+        for process in (server, stub):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("serve_app", "output")}
+    report["environment"] = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import Problem
+
+
+def make_cache_key(section: str, problem: Problem, tags: Optional[List[str]] = None, language: Optional[str] = None, model: Optional[str] = None, prompt_version: str = "1", problem_id: Optional[str] = None) -> str:
+    # Only the inputs that reach the prompt are part of the key, so the same
+    # problem opened by different users (or from a different URL) shares entries.
+    # With a canonical problem id, near-duplicate scrapes of one problem share
+    # them too; tags are derived from the text, so they follow the id.
+    if problem_id is not None:
+        identity = {"problem_id": problem_id}
+    else:
+        identity = {
+            "title": problem.title.strip(),
+            "description": problem.description.strip(),
+            "tags": list(tags) if tags else [],
+        }
+    payload = json.dumps({
+        "section": section,
+        **identity,
+        "language": language.lower() if language else None,
+        "model": model,
+        "prompt_version": prompt_version,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheStore:
+    """Per-process LRU store bounded by entry count."""
+
+    backend = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.backend, "entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class SQLiteCacheStore:
+    """On-disk store shared by every worker process on the host.
+
+    The database runs in WAL mode so readers never wait for the writer, and it
+    survives restarts and redeploys. Once the stored values exceed ``max_bytes``
+    the least recently accessed entries (and anything expired) are deleted.
+    """
+
+    backend = "sqlite"
+    # Every call blocks on the database; ResponseCache runs them off the event loop.
+    blocking = True
+
+    # Access times are only refreshed when older than this, so cache hits don't
+    # turn every read into a write.
+    TOUCH_INTERVAL = 60.0
+    # A refresh that can't get the write lock within this many milliseconds is
+    # skipped; it only affects eviction order.
+    TOUCH_BUSY_TIMEOUT_MS = 50
+    # Eviction needs a SUM() over the table, so it only runs every N writes,
+    # on a background thread.
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._evicting = threading.Lock()
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            conn.execute(f"PRAGMA busy_timeout = {self.TOUCH_BUSY_TIMEOUT_MS}")
+            try:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.execute("PRAGMA busy_timeout = 10000")
+        return expires_at, json.loads(value)
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, encoded, len(encoded.encode("utf-8")), expires_at, time.time())
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict_in_background()
+
+    def evict_in_background(self) -> None:
+        # At most one eviction runs at a time; further triggers are dropped.
+        if not self._evicting.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.evict()
+            except sqlite3.Error:
+                pass
+            finally:
+                self._evicting.release()
+
+        threading.Thread(target=run, name="cache-evict", daemon=True).start()
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM entries")
+
+    def total_bytes(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self) -> None:
+        conn = self._connection()
+        expired = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.evictions += max(expired, 0)
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% of the budget so eviction doesn't run on every write.
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        cursor = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at")
+        for key, size in cursor:
+            if total - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        cursor.close()
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"backend": self.backend, "path": self.path, "entries": entries, "bytes": total, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+def create_cache_store(backend: str = "memory", path: str = "tutorai-cache.sqlite3", max_entries: int = 2048, max_bytes: int = 256 * 1024 * 1024):
+    if backend == "memory":
+        return MemoryCacheStore(max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteCacheStore(path, max_bytes=max_bytes)
+    raise ValueError(f"Unknown response cache backend: {backend}")
+
+
+class ResponseCache:
+    """Cache for generated tutoring sections on top of a pluggable store.
+
+    Values must be JSON-serializable. Entries expire after ``ttl`` seconds; size
+    bounds are enforced by the store. The prompt version is part of every key,
+    so bumping it invalidates old entries.
+    """
+
+    def __init__(self, store=None, ttl: float = 24 * 3600, prompt_version: str = "1", identify: Optional[Callable[[Problem], str]] = None):
+        self.store = store if store is not None else MemoryCacheStore()
+        self.ttl = ttl
+        self.prompt_version = prompt_version
+        # Optional canonical problem id (see dedup.ProblemIndex) used in keys.
+        self.identify = identify
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def key(self, section: str, problem: Problem, tags: Optional[List[str]] = None, language: Optional[str] = None, model: Optional[str] = None) -> str:
+        problem_id = self.identify(problem) if self.identify is not None else None
+        return make_cache_key(section, problem, tags, language, model, self.prompt_version, problem_id)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.store.get(key)
+        if entry is not None and entry[0] <= time.time():
+            self.store.delete(key)
+            entry = None
+            with self._lock:
+                self.expirations += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[1]
+
+    def peek(self, key: str) -> Optional[Any]:
+        # Lookup for background work and validators; not counted as a hit or miss.
+        entry = self.store.get(key)
+        return entry[1] if entry is not None and entry[0] > time.time() else None
+
+    def contains(self, key: str) -> bool:
+        return self.peek(key) is not None
+
+    def set(self, key: str, value: Any) -> None:
+        self.store.set(key, value, time.time() + self.ttl)
+
+    # Coroutine versions for the event loop. Stores that block (SQLite) run on
+    # a worker thread; the in-memory store is called directly.
+    async def _run(self, fn: Callable, *args) -> Any:
+        if getattr(self.store, "blocking", False):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await self._run(self.get, key)
+
+    async def apeek(self, key: str) -> Optional[Any]:
+        return await self._run(self.peek, key)
+
+    async def acontains(self, key: str) -> bool:
+        return await self._run(self.contains, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await self._run(self.set, key, value)
+
+    async def astats(self) -> Dict[str, Any]:
+        return await self._run(self.stats)
+
+    def invalidate(self, prompt_version: Optional[str] = None) -> None:
+        self.store.clear()
+        if prompt_version is not None:
+            self.prompt_version = prompt_version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "ttl": self.ttl,
+                "prompt_version": self.prompt_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+            }
+        stats.update(self.store.stats())
+        return stats
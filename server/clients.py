@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+
+def _sdk_http_library():
+    # The HTTP library under the openai SDK: httpx in older releases, httpx2 in
+    # newer ones. Pool limits have to be built with the same library, so take
+    # it from the SDK's client class instead of importing one ourselves.
+    for base in DefaultAsyncHttpxClient.__mro__:
+        if base.__name__ == "AsyncClient":
+            return importlib.import_module(base.__module__.partition(".")[0])
+    raise ImportError("cannot find the openai SDK's HTTP client library")
+
+
+http_library = _sdk_http_library()
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ClientPool:
+    """Bounded pool of long-lived AsyncOpenAI clients keyed by API-key hash.
+
+    Every client shares one HTTP connection pool, so keep-alive connections
+    (and their TLS sessions) are reused across requests and across keys, and
+    ``max_connections`` caps the sockets a worker opens upstream. Clients idle
+    for longer than ``idle_timeout`` seconds, or beyond ``max_clients``, are
+    dropped; raw keys are never stored as dictionary keys.
+    """
+
+    def __init__(self, max_clients: int = 256, idle_timeout: float = 900.0, max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0, timeout: float = 60.0):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.limits = http_library.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self._clients: "OrderedDict[str, Tuple[AsyncOpenAI, float]]" = OrderedDict()
+        self._http_client: Optional[DefaultAsyncHttpxClient] = None
+        self._loop = None
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evictions = 0
+
+    def _shared_http_client(self) -> DefaultAsyncHttpxClient:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        # Connections belong to the event loop that opened them; a new loop (tests,
+        # scripts calling asyncio.run repeatedly) gets a fresh pool.
+        if self._http_client is None or self._http_client.is_closed or loop is not self._loop:
+            self._clients.clear()
+            self._http_client = DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout)
+            self._loop = loop
+        return self._http_client
+
+    def _evict_idle(self, now: float) -> None:
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._clients[key]
+            self.evictions += 1
+
+    def get(self, api_key: str) -> AsyncOpenAI:
+        key = hash_api_key(api_key)
+        now = time.monotonic()
+        with self._lock:
+            http_client = self._shared_http_client()
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return entry[0]
+
+            # Retries are left to the upstream scheduler, which sees every call.
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            self._clients[key] = (client, now)
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                # Evicted clients share the HTTP pool, so they are dropped, not closed.
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            http_client = self._http_client
+            self._clients.clear()
+            self._http_client = None
+        if http_client is not None and not http_client.is_closed:
+            await http_client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "created": self.created,
+                "reused": self.reused,
+                "evictions": self.evictions,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+            }
@@ -0,0 +1,241 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# brotli is optional: without it only gzip is offered.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Streams are forwarded chunk by chunk and never buffered.
+STREAM_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header: str, available: Sequence[str]) -> Optional[str]:
+    """Picks the client's most preferred encoding among ``available`` (in server
+    preference order on ties); ``None`` means send the body as is."""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def content_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Compressed variants carry the same hash with an encoding suffix
+    # ("<hash>-gzip"), so any of them validates the content.
+    if if_none_match.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"').split("-")[0] == base:
+            return True
+    return False
+
+
+class BodyCompressor:
+    """Compresses response bodies, keeping recent results in an LRU by body
+    hash so repeat visitors don't pay for compressing the same body again."""
+
+    def __init__(self, min_size: int = 1024, max_cached: int = 256):
+        self.min_size = min_size
+        self.max_cached = max_cached
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.compressed = 0
+        self.reused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def compress(self, body: bytes, encoding: str, digest: Optional[str] = None) -> bytes:
+        key = (digest, encoding)
+        with self._lock:
+            self.bytes_in += len(body)
+            cached = self._cache.get(key) if digest is not None else None
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.reused += 1
+                self.bytes_out += len(cached)
+                return cached
+        compressed = compress(body, encoding)
+        with self._lock:
+            self.compressed += 1
+            self.bytes_out += len(compressed)
+            if digest is not None:
+                self._cache[key] = compressed
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+        return compressed
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "encodings": list(self.encodings),
+                "min_size": self.min_size,
+                "not_modified": self.not_modified,
+                "compressed": self.compressed,
+                "reused": self.reused,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            }
+
+
+class ConditionalCompressionMiddleware:
+    """ASGI middleware adding ETags, conditional requests and gzip/brotli bodies.
+
+    On ``etag_paths`` the ETag comes from ``validator(path, body)``, which
+    derives it from the cached content the response would be built from (or
+    returns ``None`` when that isn't all cached yet). It is checked against
+    If-None-Match *before* the handler runs, so a match costs no generation or
+    serialization: GET and HEAD get an empty 304, and any other method (these
+    endpoints are POSTs) gets 412 Precondition Failed without being performed,
+    as RFC 9110 requires. Bodies of at least ``compressor.min_size`` bytes on
+    any route are compressed with the best encoding the client accepts. Event
+    streams pass through untouched.
+    """
+
+    def __init__(self, app, etag_paths: Sequence[str] = (), compressor: Optional[BodyCompressor] = None, validator: Optional[Callable[[str, bytes], Awaitable[Optional[str]]]] = None):
+        self.app = app
+        self.etag_paths = set(etag_paths) if validator is not None else set()
+        self.compressor = compressor or BodyCompressor()
+        self.validator = validator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        use_etag = scope["path"] in self.etag_paths and "text/event-stream" not in headers.get("accept", "")
+        encoding = choose_encoding(headers.get("accept-encoding", ""), self.compressor.encodings)
+        if not use_etag and encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        if use_etag:
+            # The validator needs the request body; it is replayed to the app.
+            body, receive = await self._buffer_body(receive)
+            if_none_match = headers.get("if-none-match", "")
+            if if_none_match:
+                etag = await self.validator(scope["path"], body)
+                if etag is not None and etag_matches(if_none_match, etag):
+                    self.compressor.record_not_modified()
+                    status = 304 if scope["method"] in ("GET", "HEAD") else 412
+                    response_headers = [(b"etag", etag.encode("latin-1")), (b"vary", b"Accept-Encoding"), (b"content-length", b"0")]
+                    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+
+        start = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                response_headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in message.get("headers", [])}
+                content_type = response_headers.get("content-type", "")
+                if message["status"] != 200 or "content-encoding" in response_headers or content_type.startswith(STREAM_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            # The handler has filled the cache by now, so this is the tag the
+            # next conditional request will be checked against.
+            etag = await self.validator(scope["path"], body) if use_etag else None
+            await self._finish(send, start, b"".join(chunks), etag, encoding)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def _buffer_body(receive) -> Tuple[bytes, Callable[[], Awaitable[dict]]]:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    async def _finish(self, send, start, body: bytes, etag: Optional[str], encoding: Optional[str]) -> None:
+        headers = [(name, value) for name, value in start.get("headers", []) if name.lower() not in (b"content-length", b"etag")]
+        if encoding is not None and len(body) >= self.compressor.min_size:
+            # Reuse is keyed on the body itself: the ETag names cached content,
+            # and a fallback body served under it must never be reused.
+            body = self.compressor.compress(body, encoding, content_etag(body) if etag is not None else None)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            if etag is not None:
+                etag = etag[:-1] + "-" + encoding + '"'
+        headers.append((b"vary", b"Accept-Encoding"))
+        if etag is not None:
+            headers.append((b"etag", etag.encode("latin-1")))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": start["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,222 @@
+import hashlib
+import html
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from models import Problem
+
+FINGERPRINT_BITS = 64
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[^\W_]+")
+# Lines the scraper picks up around the statement that say nothing about the problem.
+_BOILERPLATE = re.compile(r"^.*\b(premium|subscribe|upgrade|unlock|sign in|log in|sponsored|advertisement)\b.*$", re.IGNORECASE | re.MULTILINE)
+# Path segments that are views of a problem rather than part of its identity.
+_VIEW_SEGMENTS = {"description", "solutions", "solution", "submissions", "editorial", "discuss", "discussion", "hints"}
+_LOCALE_SEGMENT = re.compile(r"^[a-z]{2}(-[a-z]{2,4})?$")
+
+
+def canonical_slug(url: str) -> Optional[str]:
+    # "https://www.leetcode.com/problems/two-sum/description/?envType=daily" -> "leetcode.com/problems/two-sum"
+    try:
+        parts = urlsplit((url or "").strip())
+    except ValueError:
+        return None
+    host = (parts.hostname or "").lower()
+    if not host or "." not in host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    segments = [segment for segment in parts.path.lower().split("/") if segment]
+    if segments and _LOCALE_SEGMENT.match(segments[0]) and len(segments) > 1:
+        segments = segments[1:]
+    while segments and segments[-1] in _VIEW_SEGMENTS:
+        segments.pop()
+    if not segments:
+        return None
+    return host + "/" + "/".join(segments)
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", html.unescape(_TAG.sub(" ", text or "")))
+    text = _BOILERPLATE.sub(" ", text)
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(title: str, description: str) -> int:
+    """64-bit SimHash over word bigrams of the description plus title words.
+
+    Small edits (whitespace, a banner, a reworded sentence) flip few bits, so
+    the Hamming distance between fingerprints tracks textual similarity.
+    """
+    weights = [0] * FINGERPRINT_BITS
+    features: Dict[str, int] = {}
+    words = description.split()
+    for index in range(len(words) - 1):
+        feature = words[index] + " " + words[index + 1]
+        features[feature] = features.get(feature, 0) + 1
+    for word in title.split():
+        features["title:" + word] = features.get("title:" + word, 0) + 3
+    if not features and words:
+        features[words[0]] = 1
+    for feature, weight in features.items():
+        value = _hash64(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += weight if value >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(FINGERPRINT_BITS) if weights[bit] > 0)
+
+
+def hamming(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+class ProblemIndex:
+    """Maps scraped problems to a canonical id so near-duplicates share cache entries.
+
+    A problem with a recognisable URL is identified by its canonical slug, so
+    ids agree across workers and restarts, but only while its SimHash
+    fingerprint stays within ``threshold`` similarity (1 - Hamming distance / 64)
+    of the first scrape seen under that slug. Otherwise the fingerprint is
+    looked up in a banded LSH index and the problem joins the closest known one
+    within ``threshold``; failing that it gets an id derived from its
+    normalized text. The index is in-process and
+    keeps the ``max_problems`` most recently used problems.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_problems: int = 50000, max_variants: int = 100000):
+        self.max_distance = max(0, min(FINGERPRINT_BITS - 1, int((1.0 - threshold) * FINGERPRINT_BITS)))
+        self.threshold = threshold
+        # Pigeonhole: with max_distance + 1 bands, two fingerprints within
+        # max_distance bits agree exactly on at least one band.
+        self.bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self.max_problems = max_problems
+        self.max_variants = max_variants
+        self._fingerprints: "OrderedDict[str, int]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+        # Distinct scrape -> (problem id, whether it joined an earlier problem).
+        self._variants: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.new = 0
+        self.slug_matches = 0
+        self.similar_matches = 0
+        self.slug_mismatches = 0
+        self.cache_hits = 0
+        self.near_duplicate_hits = 0
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [(band, fingerprint >> (band * self.band_bits) & mask) for band in range(self.bands)]
+
+    def _add(self, problem_id: str, fingerprint: int) -> None:
+        if problem_id in self._fingerprints:
+            self._fingerprints.move_to_end(problem_id)
+            return
+        self._fingerprints[problem_id] = fingerprint
+        for band_key in self._band_keys(fingerprint):
+            self._buckets.setdefault(band_key, set()).add(problem_id)
+        while len(self._fingerprints) > self.max_problems:
+            old_id, old_fingerprint = self._fingerprints.popitem(last=False)
+            for band_key in self._band_keys(old_fingerprint):
+                bucket = self._buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    def _nearest(self, fingerprint: int) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        for band_key in self._band_keys(fingerprint):
+            for candidate in self._buckets.get(band_key, ()):
+                distance = hamming(fingerprint, self._fingerprints[candidate])
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best
+
+    @staticmethod
+    def _variant(problem: Problem) -> str:
+        return hashlib.sha256("\0".join((problem.url or "", problem.title or "", problem.description or "")).encode("utf-8")).hexdigest()
+
+    def resolve(self, problem: Problem) -> str:
+        variant = self._variant(problem)
+        with self._lock:
+            self.lookups += 1
+            entry = self._variants.get(variant)
+            if entry is not None:
+                self._variants.move_to_end(variant)
+                if entry[0] in self._fingerprints:
+                    self._fingerprints.move_to_end(entry[0])
+                return entry[0]
+
+        # Fingerprinting happens once per distinct scrape, outside the lock.
+        title = normalize_text(problem.title)
+        description = normalize_text(problem.description)
+        fingerprint = simhash(title, description)
+        slug = canonical_slug(problem.url)
+
+        with self._lock:
+            problem_id, merged = None, False
+            if slug is not None:
+                # The slug only nominates a candidate: a scrape whose text is far
+                # from the one already filed under it (a broken or tampered page)
+                # is matched by its text alone instead of sharing that slug's entries.
+                candidate = "url:" + slug
+                known = self._fingerprints.get(candidate)
+                if known is None:
+                    problem_id = candidate
+                elif hamming(fingerprint, known) <= self.max_distance:
+                    problem_id, merged = candidate, True
+                    self.slug_matches += 1
+                else:
+                    self.slug_mismatches += 1
+            if problem_id is None:
+                problem_id = self._nearest(fingerprint)
+                merged = problem_id is not None
+                self.similar_matches += merged
+            if problem_id is None:
+                problem_id = "text:" + hashlib.sha256(f"{title}\0{description}".encode("utf-8")).hexdigest()[:32]
+            self.new += not merged
+            self._add(problem_id, fingerprint)
+            self._variants[variant] = (problem_id, merged)
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+            return problem_id
+
+    def record_cache_hit(self, problem: Problem) -> None:
+        # Counts cache hits, and those served to a variant that only matched an
+        # earlier problem by slug or similarity (an exact-text cache would miss).
+        entry = self._variants.get(self._variant(problem))
+        with self._lock:
+            self.cache_hits += 1
+            if entry is not None and entry[1]:
+                self.near_duplicate_hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            merged = self.slug_matches + self.similar_matches
+            variants = self.new + merged
+            return {
+                "threshold": self.threshold,
+                "max_distance": self.max_distance,
+                "problems": len(self._fingerprints),
+                "variants": len(self._variants),
+                "lookups": self.lookups,
+                "new": self.new,
+                "slug_matches": self.slug_matches,
+                "similar_matches": self.similar_matches,
+                "slug_mismatches": self.slug_mismatches,
+                # Share of distinct scrapes that resolved to a problem seen before.
+                "merge_rate": round(merged / variants, 4) if variants else 0.0,
+                "cache_hits": self.cache_hits,
+                "near_duplicate_hits": self.near_duplicate_hits,
+                "near_duplicate_hit_rate": round(self.near_duplicate_hits / self.cache_hits, 4) if self.cache_hits else 0.0,
+            }
@@ -0,0 +1,269 @@
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Upstream completions run from ~0.3s to tens of seconds, cached
+# responses in the low milliseconds, so the buckets span both.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum.
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# A collector returns (name, kind, help, [(labels, value), ...]) families and is
+# called on every scrape, for values other components already keep.
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format.
+
+    Each uvicorn worker keeps its own registry; with several workers, give each
+    one its own scrape target and aggregate in Prometheus.
+    """
+
+    def __init__(self, prefix: str = "tutorai"):
+        self.prefix = prefix
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}" if self.prefix else name
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self._name(name), documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(self._name(name), documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self._name(name), documentation, labels, buckets))
+
+    def collector(self, collect: Collector) -> Collector:
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                # A failing stats source must not take the whole scrape down.
+                continue
+            for name, kind, documentation, samples in families:
+                name = self._name(name)
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def numeric_stats(stats: Dict[str, Any]) -> Dict[str, float]:
+    # Flattens a stats() dict to its numeric leaves, e.g. {"hits": 3, "backend": "memory"} -> {"hits": 3}.
+    flat: Dict[str, float] = {}
+    for key, value in stats.items():
+        if isinstance(value, (int, float)):
+            flat[key] = float(value)
+        elif isinstance(value, dict):
+            flat.update({f"{key}_{inner}": number for inner, number in numeric_stats(value).items()})
+    return flat
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route, method and status code.", ("route", "method", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "Time from request start until the response body is finished.", ("route", "method"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled.")
+upstream_latency = registry.histogram("upstream_request_duration_seconds", "Latency of chat completion calls to the model API.", ("section", "model"))
+upstream_ttft = registry.histogram("upstream_time_to_first_token_seconds", "Time until the first streamed token arrives.", ("section", "model"))
+upstream_errors = registry.counter("upstream_errors_total", "Failed chat completion calls by exception type.", ("section", "error"))
+upstream_in_flight = registry.gauge("upstream_requests_in_flight", "Chat completion calls currently waiting on the model API.", ("section",))
+upstream_tokens = registry.counter("upstream_tokens_total", "Tokens reported by the model API.", ("section", "model", "kind"))
+hedges = registry.counter("hedged_requests_total", "Backup requests fired after a section passed its p95, by which attempt won.", ("section", "outcome"))
+fallbacks = registry.counter("fallbacks_total", "Responses served from fallback content instead of the model.", ("section", "reason"))
+
+
+def record_usage(section: str, model: str, usage) -> None:
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, kind, None)
+        if count:
+            upstream_tokens.inc(count, section=section, model=model, kind=kind.split("_")[0])
+
+
+def record_fallback(section: str, reason: str) -> None:
+    fallbacks.inc(section=section, reason=reason)
+    tracing.current_span().set(fallback=reason)
+
+
+@asynccontextmanager
+async def upstream_call(section: str, model: str):
+    """Times one upstream call and counts its failure, if any, by exception type."""
+    upstream_in_flight.inc(section=section)
+    started = time.perf_counter()
+    try:
+        with tracing.span("upstream.attempt", section=section, model=model):
+            yield
+    except Exception as e:
+        # Cancellation (a hedged call that lost, a shutdown) is not an error.
+        upstream_errors.inc(section=section, error=type(e).__name__)
+        raise
+    finally:
+        upstream_in_flight.dec(section=section)
+        upstream_latency.observe(time.perf_counter() - started, section=section, model=model)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight requests per route.
+
+    Requests are labelled with the route template (``/chat/sessions/{session_id}``),
+    never the raw path, and unmatched paths share one label. Latency runs until
+    the last body chunk is sent, so streaming responses count their full length.
+    """
+
+    def __init__(self, app, excluded: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.excluded = set(excluded)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope on the way in.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_in_flight.dec()
+            http_latency.observe(time.perf_counter() - started, route=route, method=method)
+            http_requests.inc(route=route, method=method, status=status)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 
 class Problem(BaseModel):
     title: str
@@ -8,6 +8,29 @@ class Problem(BaseModel):
     constraints: Optional[str] = None
     url: str
 
+class ProblemRequest(BaseModel):
+    problem: Problem
+    user_api_key: Optional[str] = None
+    # Language the client would ask /solution for; only used for prefetching.
+    language: Optional[str] = None
+
+class TutoringRequest(ProblemRequest):
+    mode: Optional[Literal["sections", "combined"]] = None
+    stream: bool = False
+
+class TutoringBatchRequest(BaseModel):
+    problems: List[Problem]
+    user_api_key: Optional[str] = None
+    mode: Optional[Literal["sections", "combined"]] = None
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    stream: bool = False
+
+class SolutionRequest(ProblemRequest):
+    language: str = "python"
+
+class TagBatchRequest(BaseModel):
+    problems: List[Problem]
+
 class ProblemMeta(BaseModel):
     title: str
     url: str
@@ -27,14 +50,59 @@ class HintResponse(BaseModel):
     solution: Optional[str] = None
     disclaimer: str
 
+class HintsResponse(BaseModel):
+    hints: List[str]
+
+class PlanResponse(BaseModel):
+    plan: str
+
+class EdgeCasesResponse(BaseModel):
+    edge_cases: List[str]
+
+class ComplexityResponse(BaseModel):
+    complexity: Complexity
+
+class SolutionResponse(BaseModel):
+    solution: str
+
+class ProblemTags(BaseModel):
+    url: str
+    tags: List[str]
+    scores: Dict[str, float]
+
+class TagBatchResponse(BaseModel):
+    results: List[ProblemTags]
+
+class EditorEdit(BaseModel):
+    start: int
+    end: int
+    text: str = ""
+
 class ChatMessage(BaseModel):
     content: str
-    problem_context: str
+    problem_context: Optional[str] = None
     current_language: Optional[str] = None
     dom_elements: Optional[dict] = None
     timestamp: Optional[str] = None
     user_api_key: Optional[str] = None
+    session_id: Optional[str] = None
+    editor_edits: Optional[List[EditorEdit]] = None
+    editor_base_hash: Optional[str] = None
 
 class ChatResponse(BaseModel):
     message: str
     timestamp: Optional[str] = None
+    session_id: Optional[str] = None
+    editor_hash: Optional[str] = None
+    prompt_tokens: Optional[dict] = None
+
+class ChatSessionCreate(BaseModel):
+    problem_context: str
+    dom_elements: Optional[dict] = None
+    current_language: Optional[str] = None
+
+class ChatSessionInfo(BaseModel):
+    session_id: str
+    editor_hash: str
+    max_turns: int
+    ttl: int
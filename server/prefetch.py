@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from upstream import BackgroundWork, background_priority
+
+
+class Prefetcher:
+    """Generates sections a client is likely to ask for next, in the background.
+
+    Jobs wait in a bounded queue (duplicates by key are dropped) and run on
+    ``workers`` tasks with ``upstream.background_priority`` set, so their model
+    calls only use capacity that no live request is waiting for (until a live
+    request joins the same single-flight call, which promotes it). Speculative
+    spend is capped at ``token_budget`` tokens per ``budget_window`` seconds;
+    once the budget is used up, jobs are dropped until the window rolls over.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 256, token_budget: int = 200_000, budget_window: float = 3600.0):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.token_budget = token_budget
+        self.budget_window = budget_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[str] = set()
+        self._window_started = time.monotonic()
+        self._spent = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.over_budget = 0
+        self.tokens_total = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+
+    def _roll_window(self) -> None:
+        if time.monotonic() - self._window_started >= self.budget_window:
+            self._window_started = time.monotonic()
+            self._spent = 0
+
+    def exhausted(self) -> bool:
+        self._roll_window()
+        return self.token_budget > 0 and self._spent >= self.token_budget
+
+    def charge(self, usage: Any) -> None:
+        """Counts the tokens of a model call made by a prefetch job."""
+        tokens = getattr(usage, "total_tokens", None) or (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+        self._roll_window()
+        self._spent += tokens
+        self.tokens_total += tokens
+
+    def submit(self, key: str, job: Callable[[], Awaitable[Any]]) -> bool:
+        """Queues ``job`` unless one with the same key is pending, the queue is
+        full, the budget is spent or the workers aren't running."""
+        if self._queue is None or key in self._pending:
+            return False
+        if self.exhausted():
+            self.over_budget += 1
+            return False
+        try:
+            self._queue.put_nowait((key, job))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(key)
+        self.queued += 1
+        return True
+
+    async def _work(self) -> None:
+        queue = self._queue
+        while True:
+            key, job = await queue.get()
+            # Each job gets its own marker, so a live request joining one job's
+            # call promotes that job only.
+            token = background_priority.set(BackgroundWork())
+            try:
+                if self.exhausted():
+                    self.over_budget += 1
+                    continue
+                await job()
+                self.completed += 1
+            except Exception:
+                # Speculative work; the live request will simply try again.
+                self.failed += 1
+            finally:
+                background_priority.reset(token)
+                self._pending.discard(key)
+                queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        self._roll_window()
+        return {
+            "workers": len(self._tasks),
+            "queue": self._queue.qsize() if self._queue is not None else 0,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "over_budget": self.over_budget,
+            "token_budget": self.token_budget,
+            "tokens_in_window": self._spent,
+            "tokens_total": self.tokens_total,
+        }
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# tiktoken is optional: when it is installed (and its encoding files are
+# available) counts are exact, otherwise a local approximation of ~4 characters
+# per token is used. Either way nothing leaves the process.
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+_APPROX_TOKEN = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d]")
+_EXAMPLE_SPLIT = re.compile(r"(?=\bExample\s*\d+\s*:)", re.IGNORECASE)
+
+DEFAULT_BUDGETS: Dict[str, int] = {
+    "title": 64,
+    "description": 1200,
+    "examples": 400,
+    "constraints": 200,
+    "problem_context": 600,
+    "codeEditor": 1200,
+    "testCases": 300,
+    "question": 500,
+    "history": 1500,
+}
+
+
+def load_budgets(overrides: Optional[str] = None) -> Dict[str, int]:
+    budgets = dict(DEFAULT_BUDGETS)
+    if overrides:
+        budgets.update({field: int(limit) for field, limit in json.loads(overrides).items()})
+    return budgets
+
+
+BUDGETS = load_budgets(os.getenv("PROMPT_TOKEN_BUDGETS"))
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(_APPROX_TOKEN.findall(text))
+
+
+def _cut(text: str, budget: int, from_end: bool = False) -> str:
+    if budget <= 0:
+        return ""
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text)
+        return _ENCODING.decode(tokens[-budget:] if from_end else tokens[:budget])
+    matches = list(_APPROX_TOKEN.finditer(text))
+    if len(matches) <= budget:
+        return text
+    if from_end:
+        return text[matches[-budget].start():]
+    return text[:matches[budget - 1].end()]
+
+
+def truncate_tokens(text: str, budget: int, from_end: bool = False) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    marker = "[... truncated]"
+    kept = _cut(text, max(budget - count_tokens(marker), 0), from_end)
+    return f"{marker}\n{kept}" if from_end else f"{kept}\n{marker}"
+
+
+def trim_examples(examples: str, budget: int) -> str:
+    # Whole examples are kept in order until the budget runs out; the first one
+    # is truncated rather than dropped if it alone is too long.
+    if count_tokens(examples) <= budget:
+        return examples
+    parts = [part for part in _EXAMPLE_SPLIT.split(examples) if part.strip()]
+    kept: List[str] = []
+    used = 0
+    for part in parts:
+        cost = count_tokens(part)
+        if used + cost > budget:
+            break
+        kept.append(part)
+        used += cost
+    if not kept:
+        return truncate_tokens(parts[0] if parts else examples, budget)
+    omitted = len(parts) - len(kept)
+    return "".join(kept).rstrip() + f"\n[{omitted} more example(s) omitted]"
+
+
+def trim_code(code: str, budget: int, cursor: Optional[int] = None) -> str:
+    # Keeps a window of whole lines centred on the cursor (the end of the buffer
+    # when no cursor is known) and grows it one line at a time in both
+    # directions, so the code being worked on survives and elisions are marked.
+    if count_tokens(code) <= budget:
+        return code
+    lines = code.split("\n")
+    if cursor is None or not 0 <= cursor <= len(code):
+        center = len(lines) - 1
+        while center > 0 and not lines[center].strip():
+            center -= 1
+    else:
+        center = code.count("\n", 0, cursor)
+    costs = [count_tokens(line) + 1 for line in lines]
+    start = end = center
+    used = costs[center]
+    if used > budget:
+        return truncate_tokens(lines[center], budget)
+    grew = True
+    while grew:
+        grew = False
+        if end + 1 < len(lines) and used + costs[end + 1] <= budget:
+            end += 1
+            used += costs[end]
+            grew = True
+        if start > 0 and used + costs[start - 1] <= budget:
+            start -= 1
+            used += costs[start]
+            grew = True
+    window = lines[start:end + 1]
+    if start > 0:
+        window.insert(0, f"[... {start} line(s) above omitted]")
+    if end < len(lines) - 1:
+        window.append(f"[... {len(lines) - 1 - end} line(s) below omitted]")
+    return "\n".join(window)
+
+
+def trim_history(messages: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+    # Oldest turns go first; question/answer pairs are dropped together.
+    kept = list(messages)
+    while kept and sum(count_tokens(message["content"]) for message in kept) > budget:
+        kept = kept[2:]
+    return kept
+
+
+class PromptBuilder:
+    """Fits prompt fields into per-field token budgets and records the result.
+
+    ``report()`` returns the tokens each field contributed after trimming, the
+    total, and which fields had to be trimmed.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        self.budgets = budgets if budgets is not None else BUDGETS
+        self.tokens: Dict[str, int] = {}
+        self.truncated: List[str] = []
+        self.prompt_tokens: Optional[int] = None
+
+    def _record(self, name: str, original: str, fitted: str) -> str:
+        self.tokens[name] = self.tokens.get(name, 0) + count_tokens(fitted)
+        if fitted != original:
+            self.truncated.append(name)
+        return fitted
+
+    def text(self, name: str, value: Any, from_end: bool = False) -> Any:
+        if not isinstance(value, str) or name not in self.budgets:
+            return value
+        return self._record(name, value, truncate_tokens(value, self.budgets[name], from_end))
+
+    def examples(self, name: str, value: Any) -> Any:
+        if not isinstance(value, str) or name not in self.budgets:
+            return value
+        return self._record(name, value, trim_examples(value, self.budgets[name]))
+
+    def code(self, name: str, value: Any, cursor: Optional[int] = None) -> Any:
+        if not isinstance(value, str) or name not in self.budgets:
+            return value
+        return self._record(name, value, trim_code(value, self.budgets[name], cursor))
+
+    def history(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        kept = trim_history(messages, self.budgets.get("history", 0))
+        self.tokens["history"] = sum(count_tokens(message["content"]) for message in kept)
+        if len(kept) != len(messages):
+            self.truncated.append("history")
+        return kept
+
+    def measure(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        # Counts the assembled prompt, instructions included.
+        self.prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        return messages
+
+    def report(self) -> Dict[str, Any]:
+        fields_total = sum(self.tokens.values())
+        return {
+            "fields": dict(self.tokens),
+            "total": self.prompt_tokens if self.prompt_tokens is not None else fields_total,
+            "truncated": list(self.truncated),
+            "exact": _ENCODING is not None,
+        }
+
+
+class PromptStats:
+    """Running per-section totals of prompt tokens and trimmed fields."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections: Dict[str, Dict[str, int]] = {}
+
+    def record(self, section: str, report: Dict[str, Any]) -> None:
+        with self._lock:
+            stats = self._sections.setdefault(section, {"prompts": 0, "tokens": 0, "truncated": 0})
+            stats["prompts"] += 1
+            stats["tokens"] += report["total"]
+            stats["truncated"] += 1 if report["truncated"] else 0
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {section: dict(stats) for section, stats in self._sections.items()}
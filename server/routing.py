@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Request parameters each section used before routing was configurable.
+DEFAULT_MAX_TOKENS: Dict[str, int] = {
+    "hints": 200,
+    "plan": 250,
+    "edge_cases": 200,
+    "complexity": 250,
+    "solution": 500,
+    "solution_in_language": 500,
+    "combined": 1400,
+    "chat": 400,
+}
+DEFAULT_TEMPERATURE = 0.7
+
+
+class SectionRoute:
+    """Model and request parameters for one section, plus whether to hedge it."""
+
+    def __init__(self, model: str, max_tokens: int, temperature: float = DEFAULT_TEMPERATURE, hedge: bool = False):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.hedge = hedge
+
+    def params(self) -> Dict[str, Any]:
+        return {"model": self.model, "max_tokens": self.max_tokens, "temperature": self.temperature}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.params(), "hedge": self.hedge}
+
+
+def load_routes(config: Optional[str], default_model: str) -> Dict[str, SectionRoute]:
+    """Builds the route table from SECTION_ROUTES-style JSON.
+
+    ``{"hints": {"model": "gpt-4o-mini", "hedge": true}, "solution_in_language": {"model": "gpt-4o", "max_tokens": 800}}``
+    Sections left out keep the default model and their previous parameters;
+    a ``"*"`` entry overrides the defaults for every section.
+    """
+    overrides = json.loads(config) if config else {}
+    unknown = set(overrides) - set(DEFAULT_MAX_TOKENS) - {"*"}
+    if unknown:
+        raise ValueError(f"Unknown section(s) in SECTION_ROUTES: {', '.join(sorted(unknown))}")
+    shared = overrides.get("*", {})
+    routes = {}
+    for section, max_tokens in DEFAULT_MAX_TOKENS.items():
+        settings = {**shared, **overrides.get(section, {})}
+        routes[section] = SectionRoute(
+            model=settings.get("model", default_model),
+            max_tokens=int(settings.get("max_tokens", max_tokens)),
+            temperature=float(settings.get("temperature", DEFAULT_TEMPERATURE)),
+            hedge=bool(settings.get("hedge", False))
+        )
+    return routes
+
+
+class LatencyTracker:
+    """Recent successful call latencies per section, for hedging thresholds."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, section: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(section, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, section: str, fraction: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(section, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            sections = list(self._samples)
+        return {
+            section: {"samples": len(self._samples[section]), "p50": self.percentile(section, 0.5), "p95": self.percentile(section, 0.95)}
+            for section in sections
+        }
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float], allow: Callable[[], bool] = lambda: True, on_outcome: Callable[[str], None] = None) -> Any:
+    """Runs ``call``; if it is still pending after ``delay`` seconds, starts a
+    second identical call and returns whichever succeeds first, cancelling the
+    other. A failure only surfaces once both attempts have failed.
+    """
+    primary = asyncio.ensure_future(call())
+    tasks = [primary]
+    try:
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not allow():
+            return await primary
+
+        backup = asyncio.ensure_future(call())
+        tasks.append(backup)
+        pending = set(tasks)
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.index):
+                if task.exception() is None:
+                    if on_outcome:
+                        on_outcome("primary" if task is primary else "backup")
+                    return task.result()
+                if first_error is None or task is primary:
+                    first_error = task.exception()
+        if on_outcome:
+            on_outcome("failed")
+        raise first_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,24 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# orjson is optional: when it is installed JSON bodies are rendered with it,
+# otherwise with the standard library encoder (same output, just slower).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,136 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+EDITOR_FIELD = "codeEditor"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()[:16]
+
+
+def apply_editor_edits(content: str, edits) -> str:
+    # Edits are applied in order, each against the result of the previous one,
+    # like successive editor change events.
+    for edit in edits:
+        if not 0 <= edit.start <= edit.end <= len(content):
+            raise ValueError(f"Edit range {edit.start}-{edit.end} is outside the editor content (length {len(content)})")
+        content = content[:edit.start] + edit.text + content[edit.end:]
+    return content
+
+
+class EditorConflict(Exception):
+    def __init__(self, server_hash: str):
+        super().__init__("Editor content is out of sync with the session")
+        self.server_hash = server_hash
+
+
+class ChatSession:
+    def __init__(self, session_id: str, problem_context: str, dom_elements: Optional[dict], language: Optional[str], max_turns: int):
+        self.session_id = session_id
+        self.problem_context = problem_context
+        self.dom_elements: Dict[str, Any] = dict(dom_elements or {})
+        self.language = language
+        self.history: Deque[Tuple[str, str]] = deque(maxlen=max_turns * 2)
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.lock = threading.Lock()
+
+    @property
+    def editor_content(self) -> str:
+        return self.dom_elements.get(EDITOR_FIELD) or ""
+
+    @property
+    def editor_hash(self) -> str:
+        return content_hash(self.editor_content)
+
+    def update(self, problem_context: Optional[str] = None, dom_elements: Optional[dict] = None, editor_edits=None, base_hash: Optional[str] = None, language: Optional[str] = None) -> None:
+        with self.lock:
+            if problem_context:
+                self.problem_context = problem_context
+            if language:
+                self.language = language
+            if dom_elements:
+                # Only the fields that changed need to be sent; a full codeEditor
+                # value replaces the buffer and resynchronises the session.
+                self.dom_elements.update(dom_elements)
+            if editor_edits:
+                if base_hash and base_hash != self.editor_hash:
+                    raise EditorConflict(self.editor_hash)
+                self.dom_elements[EDITOR_FIELD] = apply_editor_edits(self.editor_content, editor_edits)
+            self.updated_at = time.time()
+
+    def add_turn(self, question: str, answer: str) -> None:
+        with self.lock:
+            self.history.append(("user", question))
+            self.history.append(("assistant", answer))
+            self.updated_at = time.time()
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        with self.lock:
+            return [{"role": role, "content": content} for role, content in self.history]
+
+
+class ChatSessionStore:
+    """Bounded in-process store of chat sessions.
+
+    Sessions hold the problem context, the DOM fields and the last ``max_turns``
+    question/answer pairs. They expire after ``ttl`` seconds without activity
+    and the least recently used session is dropped beyond ``max_sessions``.
+    """
+
+    def __init__(self, max_sessions: int = 5000, ttl: float = 3600.0, max_turns: int = 6):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.updated_at <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def create(self, problem_context: str, dom_elements: Optional[dict] = None, language: Optional[str] = None) -> ChatSession:
+        session = ChatSession(secrets.token_urlsafe(18), problem_context, dom_elements, language, self.max_turns)
+        with self._lock:
+            self._expire(time.time())
+            self._sessions[session.session_id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            if session is not None:
+                # Keep the dict ordered by activity so expiry can stop early.
+                session.updated_at = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "created": self.created,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
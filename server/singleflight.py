@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from upstream import BackgroundWork, background_priority, is_background
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key onto one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive its result or exception.
+    The task is shielded, so a caller that disconnects doesn't cancel the work
+    for everybody else. A task started by background work is promoted to live
+    priority as soon as a live caller joins it.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Dict[str, BackgroundWork] = {}
+        self.leaders = 0
+        self.collapsed = 0
+        self.promoted = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.collapsed += 1
+            work = self._background.get(key)
+            if work is not None and not is_background():
+                work.promote()
+                self.promoted += 1
+                del self._background[key]
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        if is_background():
+            self._background[key] = background_priority.get()
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._background.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away.
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def is_in_flight(self, key: str) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight(),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "promoted": self.promoted,
+        }
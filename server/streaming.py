@@ -0,0 +1,158 @@
+import inspect
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+import metrics
+import tracing
+
+SSE = "sse"
+NDJSON = "ndjson"
+
+MEDIA_TYPES = {
+    SSE: "text/event-stream",
+    NDJSON: "application/x-ndjson",
+}
+
+
+def negotiate_stream_format(request: Request) -> str:
+    requested = request.query_params.get("format")
+    if requested in MEDIA_TYPES:
+        return requested
+    accept = request.headers.get("accept", "")
+    if "application/x-ndjson" in accept or "application/jsonl" in accept:
+        return NDJSON
+    return SSE
+
+
+def format_event(event: str, data: dict, fmt: str = SSE) -> str:
+    if fmt == NDJSON:
+        return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventStreamResponse(StreamingResponse):
+    """Streams pre-formatted SSE/NDJSON events and always closes the generator.
+
+    Whether the client disconnect is noticed through ``http.disconnect`` or a
+    failed send, the event generator is closed right away so its ``finally``
+    block can cancel the upstream request.
+    """
+
+    def __init__(self, events: AsyncIterator[str], fmt: str = SSE, on_close: Callable[[], None] = None, **kwargs):
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        headers.update(kwargs.pop("headers", None) or {})
+        super().__init__(events, media_type=MEDIA_TYPES[fmt], headers=headers, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        # ``on_close`` also runs when the generator never started, e.g. the
+        # client left before the first byte, so resources it holds are freed.
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                with anyio.CancelScope(shield=True):
+                    await aclose()
+
+
+async def replay_text(text: str, fmt: str = SSE, extra: Optional[dict] = None) -> AsyncIterator[str]:
+    # Cached answers are sent as a single token so clients handle both paths alike.
+    yield format_event("token", {"content": text}, fmt)
+    yield format_event("done", {"content": text, "ttft_ms": 0.0, "total_ms": 0.0, "cached": True, **(extra or {})}, fmt)
+
+
+async def stream_chat_completion(client, fmt: str = SSE, on_complete: Callable[[str], Any] = None, extra: Optional[dict] = None, section: str = "stream", lease=None, retrying: Callable[[Callable[[], Awaitable]], Awaitable] = None, **kwargs) -> AsyncIterator[str]:
+    # ``lease`` is an upstream scheduler slot held until the stream ends, and
+    # ``retrying`` wraps opening the stream, which is safe to retry because no
+    # token has been sent yet.
+    model = kwargs.get("model", "")
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    error = None
+    usage = None
+    metrics.upstream_in_flight.inc(section=section)
+    # Ended explicitly: the generator is resumed once per chunk.
+    span = tracing.span("upstream.stream", section=section, model=model)
+
+    def open_stream():
+        # The final chunk then carries token usage, with an empty choices list.
+        return client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+
+    stream = None
+    # One try/finally from opening the stream on, so the gauge, the span and
+    # the lease are released however the generator ends, including a client
+    # that disconnects while the stream is still being opened.
+    try:
+        try:
+            stream = await (retrying(open_stream) if retrying else open_stream())
+        except Exception as e:
+            error = e
+            yield format_event("error", {"detail": str(e)}, fmt)
+            return
+
+        async for chunk in stream:
+            metrics.record_usage(section, model, getattr(chunk, "usage", None))
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                metrics.upstream_ttft.observe(first_token_at - started, section=section, model=model)
+            parts.append(delta)
+            yield format_event("token", {"content": delta}, fmt)
+
+        text = "".join(parts).strip()
+        if on_complete and text:
+            # May return an awaitable, e.g. a cache write run off the loop.
+            result = on_complete(text)
+            if inspect.isawaitable(result):
+                await result
+        finished = time.perf_counter()
+        yield format_event("done", {
+            "content": text,
+            "ttft_ms": round(((first_token_at or finished) - started) * 1000, 1),
+            "total_ms": round((finished - started) * 1000, 1),
+            "cached": False,
+            **(extra or {}),
+        }, fmt)
+    except Exception as e:
+        error = e
+        yield format_event("error", {"detail": str(e)}, fmt)
+    finally:
+        metrics.upstream_in_flight.dec(section=section)
+        if stream is not None:
+            metrics.upstream_latency.observe(time.perf_counter() - started, section=section, model=model)
+        if error is not None:
+            metrics.upstream_errors.inc(section=section, error=type(error).__name__)
+            span.record_error(error)
+        span.set(
+            ttft_ms=round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None)
+        ).end()
+        try:
+            # Runs on normal completion and when the client goes away; closing
+            # the stream drops the upstream HTTP response so generation stops billing.
+            if stream is not None:
+                with anyio.CancelScope(shield=True):
+                    await stream.close()
+        finally:
+            if lease is not None:
+                lease.release()
@@ -0,0 +1,177 @@
+"""Local stand-in for the chat completions API, for benchmarks and offline runs.
+
+Usage:
+    python stub_llm.py --port 5051 --latency 0.4 --jitter 0.1 --error-rate 0.02
+
+Then start the server with OPENAI_BASE_URL=http://127.0.0.1:5051/v1 and any
+OPENAI_API_KEY. Answers are canned but shaped like the real thing: hints and
+edge cases one per line, complexity in the Time/Space/Rationale format, a JSON
+document when ``response_format`` asks for one, and SSE chunks (with a usage
+chunk when requested) for ``stream: true``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LINES = [
+    "Think about what you need to remember while scanning the input once.",
+    "A hash map gives constant-time lookups of values you have already seen.",
+    "For each element, check whether its complement is already stored.",
+    "Store the index after the check so an element is not paired with itself.",
+    "Return as soon as a pair is found.",
+]
+
+COMPLEXITY = "Time: O(n) - each element is visited once\nSpace: O(n) - the map holds up to n entries\nRationale: One pass with constant-time lookups."
+
+SOLUTION = """def solve(nums, target):
+    seen = {}
+    for index, value in enumerate(nums):
+        if target - value in seen:
+            return [seen[target - value], index]
+        seen[value] = index
+    return []"""
+
+COMBINED = {
+    "hints": LINES[:4],
+    "plan": "1. Create an empty hash map.\n2. Scan the array once.\n3. Look up each complement before storing the value.",
+    "edge_cases": ["Empty input", "Duplicate values", "Negative numbers", "No valid pair"],
+    "complexity": {"time": "O(n) - one pass", "space": "O(n) - the map", "rationale": "Constant-time lookups."},
+    "solution": SOLUTION,
+}
+
+
+class StubSettings:
+    def __init__(self, latency: float = 0.4, jitter: float = 0.1, error_rate: float = 0.0, ttft: float = 0.15, chunk_words: int = 3, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.ttft = ttft
+        self.chunk_words = chunk_words
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self) -> float:
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def should_fail(self) -> bool:
+        return self.random.random() < self.error_rate
+
+
+def answer_for(body: dict) -> str:
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(COMBINED)
+    # The system prompt says which section is being asked for.
+    messages = body.get("messages") or [{}]
+    system = messages[0].get("content", "").lower()
+    if "complexity" in system:
+        return COMPLEXITY
+    if "edge case" in system:
+        return "\n".join(COMBINED["edge_cases"])
+    if "solutions with" in system:
+        return SOLUTION
+    if "step-by-step plans" in system:
+        return COMBINED["plan"]
+    return "\n".join(LINES)
+
+
+def usage_for(body: dict, content: str) -> dict:
+    # Roughly four characters per token, which is all the benchmark needs.
+    prompt_tokens = sum(len(message.get("content", "")) for message in body.get("messages", [])) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def chunks_of(content: str, words: int) -> List[str]:
+    parts = content.split(" ")
+    return [" ".join(parts[index:index + words]) + (" " if index + words < len(parts) else "") for index in range(0, len(parts), words)]
+
+
+def create_stub_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Stub chat completions API")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        settings.requests += 1
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if settings.should_fail():
+            settings.errors += 1
+            await asyncio.sleep(settings.delay() / 4)
+            return JSONResponse(status_code=500, content={"error": {"message": "stub upstream error", "type": "server_error", "code": None}})
+
+        content = answer_for(body)
+        if not body.get("stream"):
+            await asyncio.sleep(settings.delay())
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage_for(body, content),
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            def event(choices, usage=None):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices}
+                if usage is not None:
+                    chunk["usage"] = usage
+                return f"data: {json.dumps(chunk)}\n\n"
+
+            parts = chunks_of(content, settings.chunk_words)
+            total = settings.delay()
+            await asyncio.sleep(min(settings.ttft, total))
+            per_chunk = max(0.0, total - settings.ttft) / max(1, len(parts))
+            yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for part in parts:
+                yield event([{"index": 0, "delta": {"content": part}, "finish_reason": None}])
+                await asyncio.sleep(per_chunk)
+            yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield event([], usage_for(body, content))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": settings.requests, "errors": settings.errors}
+
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a local stub of the chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5051)
+    parser.add_argument("--latency", type=float, default=0.4, help="mean seconds per completion (default 0.4)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the latency in seconds (default 0.1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500 (default 0)")
+    parser.add_argument("--ttft", type=float, default=0.15, help="seconds before the first streamed chunk (default 0.15)")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    args = parse_args(argv)
+    settings = StubSettings(args.latency, args.jitter, args.error_rate, args.ttft, seed=args.seed)
+    uvicorn.run(create_stub_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
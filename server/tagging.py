@@ -0,0 +1,107 @@
+import json
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Tag -> keywords, in the order tags are preferred when scores tie. Keywords match
+# whole words (plurals included), so "dp" no longer fires inside "dpi" and a bare
+# "search" no longer implies binary search.
+TAG_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("array", ["array", "subarray", "list", "sequence", "matrix"]),
+    ("string", ["string", "substring", "text", "character", "palindrome"]),
+    ("hash map", ["hash", "hash map", "hash table", "hashmap", "map", "dictionary", "key-value"]),
+    ("stack", ["stack", "push", "pop", "parentheses"]),
+    ("heap", ["queue", "heap", "priority queue", "priority", "kth largest", "kth smallest"]),
+    ("tree", ["tree", "binary tree", "node", "subtree", "root", "leaf"]),
+    ("graph", ["graph", "edge", "vertex", "vertices", "adjacency"]),
+    ("two pointers", ["two pointer", "two-pointer", "pointer", "sliding window"]),
+    ("binary search", ["binary search", "bisect", "sorted array", "log n"]),
+    ("BFS", ["bfs", "breadth-first", "breadth first", "breadth", "level order", "level", "shortest path"]),
+    ("DFS", ["dfs", "depth-first", "depth first", "depth", "recursion", "recursive", "backtracking"]),
+    ("dynamic programming", ["dynamic programming", "dp", "memoization", "memoize", "subproblem"]),
+    ("greedy", ["greedy", "optimal"]),
+    ("math", ["math", "mathematical", "number", "integer", "digit", "prime", "modulo"]),
+]
+
+DEFAULT_TAGS = ["array", "string"]
+MAX_TAGS = 5
+TITLE_WEIGHT = 2.0
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _build_index():
+    # Keywords become token tuples. _STARTS maps each first token to the longest
+    # phrase that begins with it, so a scan only does work at candidate words.
+    phrases: Dict[Tuple[str, ...], str] = {}
+    starts: Dict[str, int] = {}
+    for tag, keywords in TAG_KEYWORDS:
+        for keyword in keywords:
+            tokens = tuple(_TOKEN.findall(keyword.lower()))
+            phrases.setdefault(tokens, tag)
+            starts[tokens[0]] = max(starts.get(tokens[0], 0), len(tokens))
+    vocabulary = frozenset(token for tokens in phrases for token in tokens)
+    return phrases, starts, vocabulary
+
+
+_PHRASES, _STARTS, _VOCABULARY = _build_index()
+_TAG_ORDER = {tag: index for index, (tag, _) in enumerate(TAG_KEYWORDS)}
+
+
+@lru_cache(maxsize=65536)
+def _normalize(token: str) -> str:
+    if token in _VOCABULARY:
+        return token
+    if token.endswith("es") and token[:-2] in _VOCABULARY:
+        return token[:-2]
+    if token.endswith("s") and token[:-1] in _VOCABULARY:
+        return token[:-1]
+    return token
+
+
+def _count_matches(text: str, scores: Dict[str, float], weight: float) -> None:
+    tokens = [_normalize(token) for token in _TOKEN.findall(text.lower())]
+    for index, token in enumerate(tokens):
+        longest = _STARTS.get(token)
+        if not longest:
+            continue
+        # Longest phrase wins at a given position ("binary search" over "binary"),
+        # while overlapping phrases at later positions are still counted.
+        for length in range(longest, 0, -1):
+            tag = _PHRASES.get(tuple(tokens[index:index + length]))
+            if tag is not None:
+                scores[tag] = scores.get(tag, 0.0) + weight
+                break
+
+
+def score_tags(title: str, description: str = "") -> List[Tuple[str, float]]:
+    scores: Dict[str, float] = {}
+    _count_matches(title or "", scores, TITLE_WEIGHT)
+    _count_matches(description or "", scores, 1.0)
+    return sorted(scores.items(), key=lambda item: (-item[1], _TAG_ORDER[item[0]]))
+
+
+def tags_from_scores(scored: Sequence[Tuple[str, float]], limit: int = MAX_TAGS) -> List[str]:
+    tags = [tag for tag, _ in scored[:limit]]
+    return tags or list(DEFAULT_TAGS)
+
+
+def tag_many(items: Iterable[Tuple[str, str]]) -> List[List[Tuple[str, float]]]:
+    return [score_tags(title, description) for title, description in items]
+
+
+if __name__ == "__main__":
+    # Offline re-tagging: reads JSONL problems ({"title", "description", ...}) from
+    # a file or stdin and writes each record back with "tags" and "tag_scores".
+    source = open(sys.argv[1], encoding="utf-8") if len(sys.argv) > 1 else sys.stdin
+    with source:
+        for line in source:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            scored = score_tags(record.get("title", ""), record.get("description", ""))
+            record["tags"] = tags_from_scores(scored)
+            record["tag_scores"] = dict(scored)
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
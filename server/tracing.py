@@ -0,0 +1,273 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+# Tracing is off until configure() sets a sample rate. Unsampled requests (and
+# everything when tracing is off) only pay for one context variable lookup per
+# span: span() hands out a shared no-op span.
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def _new_id(bits: int = 64) -> str:
+    return format(random.getrandbits(bits), f"0{bits // 4}x")
+
+
+class Span:
+    """One timed operation in a trace; ``set()`` attaches attributes."""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attributes", "start", "started", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        duration = time.perf_counter() - self.started
+        self.tracer.export({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        })
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and exc_type is not GeneratorExit:
+            self.record_error(exc)
+        _current.reset(self._token)
+        self.end()
+
+
+class _NoopSpan:
+    __slots__ = ()
+    trace_id = None
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """Writes finished spans from a background thread, so request handling never
+    waits on disk or network.
+
+    Spans go to a JSONL file rotated at ``max_bytes`` (keeping ``backups`` old
+    files), or, with ``url``, are POSTed in NDJSON batches to a local collector.
+    When the queue is full spans are dropped rather than slowing requests down.
+    """
+
+    def __init__(self, path: str = "tutorai-traces.jsonl", url: Optional[str] = None, max_bytes: int = 50 * 1024 * 1024, backups: int = 3, max_queue: int = 10000, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.url = url
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, span: dict) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[dict] = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._write([json.dumps(item, ensure_ascii=False, default=str) for item in batch])
+
+    def _write(self, lines: List[str]) -> None:
+        try:
+            if self.url:
+                request = urllib.request.Request(self.url, data=("\n".join(lines) + "\n").encode("utf-8"), headers={"content-type": "application/x-ndjson"}, method="POST")
+                with urllib.request.urlopen(request, timeout=5.0):
+                    pass
+            else:
+                self._rotate_if_needed()
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write("\n".join(lines) + "\n")
+            self.exported += len(lines)
+        except Exception:
+            self.failed += len(lines)
+
+    def _rotate_if_needed(self) -> None:
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sink": self.url or self.path,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, exporter: Optional[SpanExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.traces = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and self.exporter is not None
+
+    def start_trace(self, name: str, **attributes: Any):
+        """Root span for one request, or the no-op span if it isn't sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        self.traces += 1
+        return Span(self, name, _new_id(128), None, attributes)
+
+    def export(self, span: dict) -> None:
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+
+tracer = Tracer()
+
+
+def configure(sample_rate: float, exporter: Optional[SpanExporter] = None) -> Tracer:
+    tracer.sample_rate = max(0.0, min(1.0, sample_rate))
+    tracer.exporter = exporter
+    return tracer
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def span(name: str, **attributes: Any):
+    """Child of the current span. Use it as ``with tracing.span("name") as s:``,
+    or call ``end()`` on it for work that outlives the caller's frame (such as
+    a streamed response) without making it current.
+
+    Outside a sampled trace this is the shared no-op span.
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.tracer, name, parent.trace_id, parent.span_id, attributes)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per sampled HTTP request.
+
+    The span is named after the route template and ends with the last body
+    chunk, so streamed responses are traced for their full length. Sampled
+    responses carry the trace id in an ``X-Trace-Id`` header.
+    """
+
+    def __init__(self, app, tracer: Tracer = tracer, excluded=("/metrics", "/health")):
+        self.app = app
+        self.tracer = tracer
+        self.excluded = set(excluded)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled or scope["path"] in self.excluded:
+            await self.app(scope, receive, send)
+            return
+        root = self.tracer.start_trace("http", method=scope["method"], path=scope["path"])
+        if root is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set(status_code=message["status"])
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", root.trace_id.encode("latin-1"))]}
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    root.name = f"{scope['method']} {route}"
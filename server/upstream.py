@@ -0,0 +1,420 @@
+import asyncio
+import contextvars
+import email.utils
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import openai
+
+import tracing
+
+# Status codes worth another attempt; anything else (400, 401, 404, ...) is the
+# caller's problem and fails immediately.
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class BackgroundWork:
+    """One unit of speculative work (see prefetch.py). Its calls are only
+    admitted into capacity that no live request is waiting for, until a live
+    request comes to depend on it and ``promote()`` is called."""
+
+    __slots__ = ("promoted", "_on_promote")
+
+    def __init__(self):
+        self.promoted = False
+        self._on_promote: List[Callable[[], None]] = []
+
+    def promote(self) -> None:
+        if self.promoted:
+            return
+        self.promoted = True
+        callbacks, self._on_promote = self._on_promote, []
+        for callback in callbacks:
+            callback()
+
+
+# Set in tasks doing speculative work; tasks they start inherit it.
+background_priority: contextvars.ContextVar[Optional[BackgroundWork]] = contextvars.ContextVar("upstream_background_priority", default=None)
+
+
+def is_background() -> bool:
+    work = background_priority.get()
+    return work is not None and not work.promoted
+
+
+class UpstreamOverloaded(Exception):
+    """Raised instead of calling the model API when the server has to shed load.
+
+    Carries the HTTP status and Retry-After value the client should see; these
+    are never replaced by fallback content.
+    """
+
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: float = 1.0):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1.0, retry_after)
+
+
+class QueueFull(UpstreamOverloaded):
+    status_code = 429
+
+
+class QueueTimeout(UpstreamOverloaded):
+    status_code = 503
+
+
+class CircuitOpen(UpstreamOverloaded):
+    status_code = 503
+
+
+class ProviderOverloaded(UpstreamOverloaded):
+    """A provider 429, 5xx or timeout that outlasted the scheduler's retries
+    (or asked for a longer Retry-After than it is willing to wait)."""
+
+    def __init__(self, error: Exception, retry_after: float = 1.0):
+        super().__init__("The model API is overloaded, try again later", retry_after=retry_after)
+        self.status_code = 429 if getattr(error, "status_code", None) == 429 else 503
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value) if value else None
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def is_provider_failure(error: Exception) -> bool:
+    # 429s are per key, so they don't say the provider as a whole is degraded.
+    return is_retryable(error) and getattr(error, "status_code", None) != 429
+
+
+class CircuitBreaker:
+    """Stops calling the provider after ``threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds one probe call is let through; its success
+    closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def _reject(self) -> None:
+        remaining = self.reset_timeout - (time.monotonic() - self.opened_at) if self.state == "open" else 1.0
+        raise CircuitOpen("Upstream model API is failing; requests are paused", retry_after=remaining)
+
+    def reject_if_open(self) -> None:
+        # Cheap pre-check for admission; doesn't claim the half-open probe.
+        if self.threshold > 0 and self.state == "open":
+            self._reject()
+
+    def check(self) -> None:
+        state = self.state
+        if state == "closed" or self.threshold <= 0:
+            return
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return
+        self._reject()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or (self.threshold > 0 and self.failures >= self.threshold):
+            if self.opened_at is None or self.probing:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class Lease:
+    """One admitted upstream call slot; ``release()`` is idempotent."""
+
+    def __init__(self, scheduler: "UpstreamScheduler", key: str):
+        self.scheduler = scheduler
+        self.key = key
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self.key)
+
+    async def __aenter__(self) -> "Lease":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class UpstreamScheduler:
+    """Admission control for calls to the model API.
+
+    At most ``max_concurrency`` calls run at once, and at most
+    ``max_per_key`` for one API key; keys in ``unlimited_keys`` (the server's
+    own) are only bound by ``max_concurrency``. Further calls wait in a FIFO
+    queue of ``max_queue`` entries; when it is full they fail fast with
+    ``QueueFull`` (HTTP 429), and a call that waits longer than
+    ``queue_timeout`` fails with ``QueueTimeout`` (HTTP 503). Admitted calls
+    are retried on timeouts, 429s and 5xx responses with jittered exponential
+    backoff, waiting at least as long as the provider's Retry-After; once
+    retries run out they fail with ``ProviderOverloaded``. A circuit breaker
+    pauses all calls while the provider keeps failing.
+
+    Calls made with ``background_priority`` set wait in a separate queue that
+    is only served once no live call is waiting. Promoting the work moves its
+    waiting calls to the live queue with a fresh ``queue_timeout``.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_per_key: int = 8, max_queue: int = 256, queue_timeout: float = 10.0, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0, max_retry_after: float = 20.0, breaker: Optional[CircuitBreaker] = None, unlimited_keys: Iterable[str] = ()):
+        self.max_concurrency = max_concurrency
+        self.max_per_key = max_per_key
+        self.unlimited_keys = set(unlimited_keys)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+        self._active = 0
+        self._per_key: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[str, asyncio.Future]] = deque()
+        self._background: Deque[Tuple[str, asyncio.Future]] = deque()
+        self._loop = None
+        # Average call duration, used to suggest a Retry-After when shedding.
+        self._average_duration = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.background_admitted = 0
+
+    def _check_loop(self) -> None:
+        # Futures belong to one event loop; a new loop (scripts calling
+        # asyncio.run repeatedly) starts from a clean slate.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._active = 0
+            self._per_key.clear()
+            self._waiters.clear()
+            self._background.clear()
+
+    def _has_capacity(self, key: str) -> bool:
+        return self._active < self.max_concurrency and self._key_has_room(key)
+
+    def _key_has_room(self, key: str) -> bool:
+        return key in self.unlimited_keys or self._per_key.get(key, 0) < self.max_per_key
+
+    def _take(self, key: str, background: bool = False) -> Lease:
+        self._active += 1
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        self.admitted += 1
+        self.background_admitted += background
+        return Lease(self, key)
+
+    def has_headroom(self, key: str) -> bool:
+        # Free capacity with nobody queued, i.e. an extra call costs no one a wait.
+        return not self._waiters and self._has_capacity(key)
+
+    def _suggested_wait(self) -> float:
+        waves = (len(self._waiters) + self._active) / max(1, self.max_concurrency)
+        return max(1.0, waves * self._average_duration)
+
+    def _can_serve(self, queue: Deque[Tuple[str, asyncio.Future]]) -> bool:
+        return any(self._key_has_room(waiting) for waiting, _ in queue)
+
+    async def acquire(self, key: str) -> Lease:
+        with tracing.span("upstream.queue", background=is_background()):
+            return await self._acquire(key)
+
+    async def _acquire(self, key: str) -> Lease:
+        self._check_loop()
+        self.breaker.reject_if_open()
+        work = background_priority.get()
+        background = work is not None and not work.promoted
+        # Queued callers go first, unless their keys are at the per-key limit;
+        # background callers also wait for every live caller.
+        queue = self._background if background else self._waiters
+        if self._has_capacity(key) and not self._can_serve(self._waiters) and not (background and self._can_serve(self._background)):
+            return self._take(key, background)
+        if len(queue) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull("Too many requests waiting for the model API", retry_after=self._suggested_wait())
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (key, future)
+        queue.append(entry)
+        self.queued += 1
+        deadline = loop.time() + self.queue_timeout
+
+        def promote() -> None:
+            # A live request now waits on this call: queue it with live callers.
+            nonlocal deadline
+            if entry in self._background:
+                self._background.remove(entry)
+                self._waiters.append(entry)
+                deadline = loop.time() + self.queue_timeout
+                self._hand_over(self._waiters)
+
+        if background:
+            work._on_promote.append(promote)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), deadline - loop.time())
+                    break
+                except asyncio.TimeoutError:
+                    if future.done() and not future.cancelled():
+                        return future.result()
+                    if loop.time() < deadline:
+                        continue
+                    self.timeouts += 1
+                    raise QueueTimeout("Timed out waiting for the model API", retry_after=self._suggested_wait())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller went away.
+                future.result().release()
+            raise
+        finally:
+            if background and promote in work._on_promote:
+                work._on_promote.remove(promote)
+            for waiting in (self._waiters, self._background):
+                if entry in waiting:
+                    waiting.remove(entry)
+            if not future.done():
+                future.cancel()
+        return future.result()
+
+    def _release(self, key: str) -> None:
+        self._active -= 1
+        remaining = self._per_key.get(key, 1) - 1
+        if remaining:
+            self._per_key[key] = remaining
+        else:
+            self._per_key.pop(key, None)
+        # Hand freed capacity to the oldest waiters that can use it, live
+        # callers first.
+        self._hand_over(self._waiters)
+        if not self._can_serve(self._waiters):
+            self._hand_over(self._background, background=True)
+
+    def _hand_over(self, queue: Deque[Tuple[str, asyncio.Future]], background: bool = False) -> None:
+        for entry in list(queue):
+            waiting, future = entry
+            if not self._has_capacity(waiting):
+                if self._active >= self.max_concurrency:
+                    break
+                continue
+            queue.remove(entry)
+            if not future.done():
+                future.set_result(self._take(waiting, background))
+
+    def _backoff(self, attempt: int, error: Exception) -> Optional[float]:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    async def retrying(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs ``fn`` under the circuit breaker, retrying transient failures."""
+        attempt = 0
+        while True:
+            self.breaker.check()
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                if is_provider_failure(e):
+                    self.breaker.record_failure()
+                elif self.breaker.probing:
+                    self.breaker.record_success()
+                retryable = is_retryable(e)
+                delay = self._backoff(attempt, e) if retryable and attempt < self.max_retries else None
+                if delay is None:
+                    if retryable:
+                        # Surfaces as a real 429/503, never as fallback text.
+                        raise ProviderOverloaded(e, retry_after_seconds(e) or self._suggested_wait()) from e
+                    raise
+                attempt += 1
+                self.retries += 1
+                tracing.current_span().set(retries=attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled mid-call: let another caller probe a half-open circuit.
+                self.breaker.probing = False
+                raise
+            self.breaker.record_success()
+            self._average_duration = 0.9 * self._average_duration + 0.1 * (time.monotonic() - started)
+            return result
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async with await self.acquire(key):
+            return await self.retrying(fn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "background_waiting": len(self._background),
+            "max_concurrency": self.max_concurrency,
+            "max_per_key": self.max_per_key,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "background_admitted": self.background_admitted,
+            "circuit": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+        }
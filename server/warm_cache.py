@@ -0,0 +1,165 @@
+"""Precompute tutoring sections for a corpus of problems into the response cache.
+
+Usage:
+    python warm_cache.py problems.jsonl --concurrency 4 --rpm 300 --languages python3 java
+
+Each line of the corpus is a Problem as JSON ({"title", "description", "url", ...}).
+Results go through the same generate_* pipeline as the server and land in its
+response cache, so point RESPONSE_CACHE_BACKEND/RESPONSE_CACHE_PATH (or
+--cache-path) at the store the server uses. Sections already cached are skipped
+and finished lines are recorded in a checkpoint file, so an interrupted run can
+simply be started again.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List, Optional, Set
+
+
+class RequestBudget:
+    """Token bucket that spreads upstream calls over a requests-per-minute budget."""
+
+    def __init__(self, requests_per_minute: float):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, requests_per_minute / 60.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: int = 1) -> None:
+        if self.rate <= 0 or cost <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Calls costing more than the bucket holds wait for a full bucket.
+                needed = min(cost, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+
+
+def load_checkpoint(path: str) -> Set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as handle:
+        return {int(line) for line in handle if line.strip().isdigit()}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Warm the TutorAI response cache from a JSONL problem corpus.")
+    parser.add_argument("corpus", help="JSONL file with one problem per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="problems generated at the same time (default 4)")
+    parser.add_argument("--rpm", type=float, default=300, help="upstream requests per minute budget, 0 for unlimited (default 300)")
+    parser.add_argument("--mode", choices=["sections", "combined"], default=None, help="generation mode (default TUTORING_MODE)")
+    parser.add_argument("--languages", nargs="*", default=[], help="also cache /solution answers for these languages")
+    parser.add_argument("--checkpoint", default=None, help="progress file (default <corpus>.checkpoint)")
+    parser.add_argument("--cache-path", default=None, help="SQLite cache file; implies RESPONSE_CACHE_BACKEND=sqlite")
+    parser.add_argument("--api-key", default=None, help="API key to use instead of OPENAI_API_KEY")
+    return parser.parse_args(argv)
+
+
+async def warm(args: argparse.Namespace) -> dict:
+    import app
+    from models import Problem
+
+    mode = args.mode or app.TUTORING_MODE
+    client = app.get_async_openai_client(args.api_key)
+    if not client:
+        raise SystemExit("No API key configured: set OPENAI_API_KEY or pass --api-key")
+    if app.response_cache.store.backend == "memory":
+        print("warning: RESPONSE_CACHE_BACKEND is 'memory'; results will not outlive this process", file=sys.stderr)
+
+    checkpoint_path = args.checkpoint or f"{args.corpus}.checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    budget = RequestBudget(args.rpm)
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    stats = {"total": 0, "skipped": 0, "cached": 0, "generated": 0, "incomplete": 0, "failed": 0, "invalid": 0}
+
+    def language_key(problem, tags, language):
+        return app.response_cache.key("solution_in_language", problem, tags, language, app.section_model("solution_in_language"))
+
+    async def missing_work(problem, tags):
+        cached = await app.lookup_cached_sections(problem, tags)
+        sections = [section for section in app.TUTORING_SECTIONS if section not in cached]
+        languages = [language for language in args.languages if await app.response_cache.aget(language_key(problem, tags, language)) is None]
+        return sections, languages
+
+    async def process(index: int, problem, checkpoint) -> None:
+        async with semaphore:
+            try:
+                await generate(index, problem, checkpoint)
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"line {index + 1}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def generate(index: int, problem, checkpoint) -> None:
+        tags = app.infer_tags(problem)
+        sections, languages = await missing_work(problem, tags)
+        if not sections and not languages:
+            stats["cached"] += 1
+            checkpoint.write(f"{index}\n")
+            checkpoint.flush()
+            return
+
+        cost = (1 if mode == "combined" else len(sections)) if sections else 0
+        await budget.acquire(cost + len(languages))
+        if sections:
+            await app.build_tutoring_sections(problem, tags, client, mode)
+        await asyncio.gather(*(app.generate_solution_in_language(problem, tags, language, client) for language in languages))
+
+        # Fallbacks are never cached, so anything still missing failed upstream
+        # and is left out of the checkpoint to be retried on the next run.
+        sections, languages = await missing_work(problem, tags)
+        if sections or languages:
+            stats["incomplete"] += 1
+            return
+        stats["generated"] += 1
+        checkpoint.write(f"{index}\n")
+        checkpoint.flush()
+
+    started = time.monotonic()
+    with open(args.corpus, encoding="utf-8") as corpus, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        pending = set()
+        for index, line in enumerate(corpus):
+            if not line.strip():
+                continue
+            stats["total"] += 1
+            if index in done:
+                stats["skipped"] += 1
+                continue
+            try:
+                problem = Problem(**json.loads(line))
+            except Exception as e:
+                stats["invalid"] += 1
+                print(f"line {index + 1}: invalid problem: {e}", file=sys.stderr)
+                continue
+            pending.add(asyncio.ensure_future(process(index, problem, checkpoint)))
+            # Keep memory flat on large corpora: only a bounded window is scheduled.
+            if len(pending) >= args.concurrency * 4:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            await asyncio.wait(pending)
+
+    await app.client_pool.aclose()
+    stats["elapsed_seconds"] = round(time.monotonic() - started, 1)
+    stats["cache"] = app.response_cache.stats()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.cache_path:
+        os.environ["RESPONSE_CACHE_BACKEND"] = "sqlite"
+        os.environ["RESPONSE_CACHE_PATH"] = args.cache_path
+    print(json.dumps(asyncio.run(warm(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()